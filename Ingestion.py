@@ -1,11 +1,140 @@
+import argparse
 import random
 import csv
 import string
 import os
-import pyodbc
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, MetaData, NVARCHAR, Table
+import metrics
+from checkpoint import clear_checkpoints, prepare_resume, record_checkpoint_raw
+from reference_data import CITIES, FIRST_NAMES, LAST_NAMES, STATES
+from pipeline import DEFAULT_DEPTH, prefetch
+from storage import BACKENDS, SQLAlchemyBackend, SQLServerBackend, configure_pool, get_backend
+
+# Predefined lists for random data generation
+# These lists provide a base for creating realistic but varied data
+PRODUCT_CATEGORIES = ["Electronics", "Fashion", "Home & Kitchen", "Sports", "Beauty", "Books", "Toys",
+                      "Grocery", "Automotive", "Health", "Office Supplies", "Garden", "Pet Supplies"]
+
+# Value pools for the Age, Gender and AmountSpent fault mixes
+INVALID_AGE_VALUES = ['NA', 'N/A', '?', 'Unknown']
+INVALID_AMOUNT_VALUES = ['NA', 'N/A', '?', 'Unknown', 'TBD']
+GENDER_OPTIONS = ['Male', 'Female', 'M', 'F', 'm', 'f', 'MALE', 'FEMALE', '']
+GENDER_WEIGHTS = [0.3, 0.3, 0.1, 0.1, 0.05, 0.05, 0.05, 0.05, 0.1]  # 10% missing
+
+# Column layout shared by every generator and by the UncleanCustomers table
+HEADER = ["CustomerID", "Name", "Age", "Gender", "Location", "PurchaseDate", "ProductCategory", "AmountSpent"]
+
+def _generate_record(customer_id):
+    """
+    Generate a single record with intentional data quality issues
+
+    Args:
+        customer_id (int): CustomerID of the record
+
+    Returns:
+        list: Record values in HEADER order, each with intentional imperfections
+    """
+    # Name: Introduces various potential data issues
+    if random.random() < 0.15:  # Sometimes missing last name
+        name = random.choice(FIRST_NAMES)
+    elif random.random() < 0.1:  # Sometimes with middle initial
+        name = f"{random.choice(FIRST_NAMES)} {random.choice(string.ascii_uppercase)}. {random.choice(LAST_NAMES)}"
+    else:
+        name = f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}"
+
+    # Introduce name errors occasionally
+    if random.random() < 0.3:
+        if random.random() < 0.5 and len(name) > 1:
+            # Random typo
+            pos = random.randint(0, len(name) - 1)
+            char = random.choice(string.ascii_letters)
+            name = name[:pos] + char + name[pos+1:]
+        else:
+            # Case inconsistency
+            if random.random() < 0.5:
+                name = name.lower()
+            else:
+                name = name.upper()
+
+    # Age: Introduces multiple data quality issues
+    if random.random() < 0.1:  # Sometimes missing
+        age = ''
+    elif random.random() < 0.05:  # Sometimes invalid
+        age = random.choice(INVALID_AGE_VALUES)
+    elif random.random() < 0.05:  # Sometimes with text
+        age = f"{random.randint(18, 75)} years"
+    else:
+        age = str(random.randint(18, 75))
+
+    # Gender: Introduces inconsistent formats and missing values
+    gender = random.choices(GENDER_OPTIONS, weights=GENDER_WEIGHTS)[0]
+
+    # Location: Creates various location format issues
+    if random.random() < 0.7:  # 70% city, state format
+        city = random.choice(CITIES)
+        state = random.choice(STATES)
+        location = f"{city}, {state}"
+    elif random.random() < 0.15:  # 15% city only
+        location = random.choice(CITIES)
+    elif random.random() < 0.1:  # 10% missing
+        location = ''
+    else:  # 5% unusual format
+        location = f"{random.choice(CITIES)}/{random.choice(STATES)}"
+
+    # Purchase Date: Generates dates with multiple formatting issues
+    date_format_choice = random.random()
+    purchase_date = datetime(2023, random.randint(1, 12), random.randint(1, 28))
+
+    # Multiple date format variations
+    if date_format_choice < 0.15:  # Missing
+        purchase_date_str = ''
+    elif date_format_choice < 0.3:  # MM/DD/YYYY
+        purchase_date_str = purchase_date.strftime('%m/%d/%Y')
+    elif date_format_choice < 0.45:  # DD-MM-YYYY
+        purchase_date_str = purchase_date.strftime('%d-%m-%Y')
+    elif date_format_choice < 0.6:  # YYYY.MM.DD
+        purchase_date_str = purchase_date.strftime('%Y.%m.%d')
+    elif date_format_choice < 0.75:  # Month DD, YYYY
+        purchase_date_str = purchase_date.strftime('%B %d, %Y')
+    elif date_format_choice < 0.9:  # MM-DD-YY
+        purchase_date_str = purchase_date.strftime('%m-%d-%y')
+    else:  # ISO format
+        purchase_date_str = purchase_date.strftime('%Y-%m-%d')
+
+    # Product Category: Introduces formatting and missing value issues
+    product_category_choice = random.random()
+    if product_category_choice < 0.1:  # Missing
+        product_category = ''
+    else:
+        product_category = random.choice(PRODUCT_CATEGORIES)
+        # Introduce case inconsistencies
+        if random.random() < 0.3:
+            if random.random() < 0.5:
+                product_category = product_category.lower()
+            else:
+                product_category = product_category.upper()
+
+    # Amount Spent: Creates various numeric formatting issues
+    amount_choice = random.random()
+    if amount_choice < 0.1:  # Missing
+        amount_spent = ''
+    elif amount_choice < 0.2:  # Invalid
+        amount_spent = random.choice(INVALID_AMOUNT_VALUES)
+    elif amount_choice < 0.4:  # Currency symbol
+        amount_spent = f"${random.uniform(10, 1000):.2f}"
+    elif amount_choice < 0.6:  # Integer
+        amount_spent = str(int(random.uniform(10, 1000)))
+    elif amount_choice < 0.8:  # Decimal with comma as decimal separator
+        amount_spent = f"{int(random.uniform(10, 1000))},{int(random.uniform(0, 100)):02d}"
+    else:  # Normal decimal
+        amount_spent = f"{random.uniform(10, 1000):.2f}"
+
+    # Compile the record with all its intentional imperfections
+    return [str(customer_id), name, age, gender, location, purchase_date_str, product_category, amount_spent]
 
 def generate_unclean_data(num_records=100):
     """
@@ -19,251 +148,609 @@ def generate_unclean_data(num_records=100):
     """
     print("Generating unclean data...")
 
-    # Predefined lists for random data generation
-    # These lists provide a base for creating realistic but varied data
-    first_names = ["John", "Jane", "Michael", "Emily", "David", "Sarah", "Robert", "Maria", "James", "Lisa",
-                  "Thomas", "Jessica", "Daniel", "Jennifer", "Christopher", "Linda", "Matthew", "Patricia",
-                  "Andrew", "Elizabeth"]
-
-    last_names = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Garcia", "Rodriguez",
-                 "Wilson", "Martinez", "Anderson", "Taylor", "Thomas", "Hernandez", "Moore", "Martin",
-                 "Jackson", "Thompson", "White"]
-
-    cities = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio",
-             "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville", "San Francisco", "Columbus",
-             "Indianapolis", "Seattle", "Denver", "Washington DC", "Boston", "Nashville"]
-
-    states = ["NY", "CA", "IL", "TX", "AZ", "PA", "FL", "OH", "GA", "NC", "WA", "CO", "DC", "MA", "TN", "VA"]
-
-    product_categories = ["Electronics", "Fashion", "Home & Kitchen", "Sports", "Beauty", "Books", "Toys",
-                         "Grocery", "Automotive", "Health", "Office Supplies", "Garden", "Pet Supplies"]
-
     # Initialize data list with header
     data = []
-    header = ["CustomerID", "Name", "Age", "Gender", "Location", "PurchaseDate", "ProductCategory", "AmountSpent"]
-    data.append(header)
+    data.append(list(HEADER))
 
     # Generate records with various data quality issues
     for i in range(1, num_records + 1):
         # CustomerID: Straightforward, sequential
-        customer_id = i
+        data.append(_generate_record(i))
 
-        # Name: Introduces various potential data issues
-        if random.random() < 0.15:  # Sometimes missing last name
-            name = random.choice(first_names)
-        elif random.random() < 0.1:  # Sometimes with middle initial
-            name = f"{random.choice(first_names)} {random.choice(string.ascii_uppercase)}. {random.choice(last_names)}"
-        else:
-            name = f"{random.choice(first_names)} {random.choice(last_names)}"
+    return data
 
-        # Introduce name errors occasionally
-        if random.random() < 0.3:
-            if random.random() < 0.5 and len(name) > 1:
-                # Random typo
-                pos = random.randint(0, len(name) - 1)
-                char = random.choice(string.ascii_letters)
-                name = name[:pos] + char + name[pos+1:]
-            else:
-                # Case inconsistency
-                if random.random() < 0.5:
-                    name = name.lower()
-                else:
-                    name = name.upper()
-
-        # Age: Introduces multiple data quality issues
-        if random.random() < 0.1:  # Sometimes missing
-            age = ''
-        elif random.random() < 0.05:  # Sometimes invalid
-            age = random.choice(['NA', 'N/A', '?', 'Unknown'])
-        elif random.random() < 0.05:  # Sometimes with text
-            age = f"{random.randint(18, 75)} years"
-        else:
-            age = str(random.randint(18, 75))
-
-        # Gender: Introduces inconsistent formats and missing values
-        gender_options = ['Male', 'Female', 'M', 'F', 'm', 'f', 'MALE', 'FEMALE', '']
-        gender_weights = [0.3, 0.3, 0.1, 0.1, 0.05, 0.05, 0.05, 0.05, 0.1]  # 10% missing
-        gender = random.choices(gender_options, weights=gender_weights)[0]
-
-        # Location: Creates various location format issues
-        if random.random() < 0.7:  # 70% city, state format
-            city = random.choice(cities)
-            state = random.choice(states)
-            location = f"{city}, {state}"
-        elif random.random() < 0.15:  # 15% city only
-            location = random.choice(cities)
-        elif random.random() < 0.1:  # 10% missing
-            location = ''
-        else:  # 5% unusual format
-            location = f"{random.choice(cities)}/{random.choice(states)}"
-
-        # Purchase Date: Generates dates with multiple formatting issues
-        date_format_choice = random.random()
-        purchase_date = datetime(2023, random.randint(1, 12), random.randint(1, 28))
-
-        # Multiple date format variations
-        if date_format_choice < 0.15:  # Missing
-            purchase_date_str = ''
-        elif date_format_choice < 0.3:  # MM/DD/YYYY
-            purchase_date_str = purchase_date.strftime('%m/%d/%Y')
-        elif date_format_choice < 0.45:  # DD-MM-YYYY
-            purchase_date_str = purchase_date.strftime('%d-%m-%Y')
-        elif date_format_choice < 0.6:  # YYYY.MM.DD
-            purchase_date_str = purchase_date.strftime('%Y.%m.%d')
-        elif date_format_choice < 0.75:  # Month DD, YYYY
-            purchase_date_str = purchase_date.strftime('%B %d, %Y')
-        elif date_format_choice < 0.9:  # MM-DD-YY
-            purchase_date_str = purchase_date.strftime('%m-%d-%y')
-        else:  # ISO format
-            purchase_date_str = purchase_date.strftime('%Y-%m-%d')
-
-        # Product Category: Introduces formatting and missing value issues
-        product_category_choice = random.random()
-        if product_category_choice < 0.1:  # Missing
-            product_category = ''
-        else:
-            product_category = random.choice(product_categories)
-            # Introduce case inconsistencies
-            if random.random() < 0.3:
-                if random.random() < 0.5:
-                    product_category = product_category.lower()
-                else:
-                    product_category = product_category.upper()
-
-        # Amount Spent: Creates various numeric formatting issues
-        amount_choice = random.random()
-        if amount_choice < 0.1:  # Missing
-            amount_spent = ''
-        elif amount_choice < 0.2:  # Invalid
-            amount_spent = random.choice(['NA', 'N/A', '?', 'Unknown', 'TBD'])
-        elif amount_choice < 0.4:  # Currency symbol
-            amount_spent = f"${random.uniform(10, 1000):.2f}"
-        elif amount_choice < 0.6:  # Integer
-            amount_spent = str(int(random.uniform(10, 1000)))
-        elif amount_choice < 0.8:  # Decimal with comma as decimal separator
-            amount_spent = f"{int(random.uniform(10, 1000))},{int(random.uniform(0, 100)):02d}"
+def _draw(rng, values, size):
+    """
+    Draw values uniformly at random, the vectorized equivalent of random.choice
+
+    Args:
+        rng (numpy.random.Generator): Random generator to draw from
+        values (list): Pool of values to choose from
+        size (int): Number of draws
+
+    Returns:
+        numpy.ndarray: Array of drawn values
+    """
+    return np.asarray(values)[rng.integers(0, len(values), size)]
+
+def generate_unclean_data_vectorized(num_records=100, seed=None, start_id=1):
+    """
+    Generate a dataset with intentional data quality issues using NumPy arrays
+
+    Every column's fault mix is drawn for the whole batch at once, keeping the
+    same per-column issue distributions as generate_unclean_data.
+
+    Args:
+        num_records (int): Number of records to generate
+        seed (int): Seed for reproducible output, None for fresh entropy
+        start_id (int): CustomerID of the first generated record
+
+    Returns:
+        pandas.DataFrame: Generated records with one string column per header field
+    """
+    rng = np.random.default_rng(seed)
+    n = num_records
+
+    # CustomerID: Straightforward, sequential
+    customer_ids = np.arange(start_id, start_id + n).astype(str)
+
+    # Name: first name only (15%), middle initial (10% of the rest) or first and last name
+    first = _draw(rng, FIRST_NAMES, n)
+    last = _draw(rng, LAST_NAMES, n)
+    initial = _draw(rng, list(string.ascii_uppercase), n)
+    full = np.char.add(np.char.add(first, ' '), last)
+    with_initial = np.char.add(np.char.add(np.char.add(first, ' '), np.char.add(initial, '. ')), last)
+    names = np.where(rng.random(n) < 0.15, first,
+                     np.where(rng.random(n) < 0.1, with_initial, full))
+
+    # Name errors: half of the 30% get a random typo, the other half a case change
+    lengths = np.char.str_len(names)
+    has_error = rng.random(n) < 0.3
+    typo = has_error & (rng.random(n) < 0.5) & (lengths > 1)
+    case_change = has_error & ~typo
+
+    # Overwrite one character per typo row directly in the fixed-width code point buffer
+    rows = np.flatnonzero(typo)
+    if rows.size:
+        codes = names.view(np.uint32).reshape(n, -1)
+        letters = np.frombuffer(string.ascii_letters.encode('utf-32-le'), dtype=np.uint32)
+        codes[rows, rng.integers(0, lengths[rows])] = letters[rng.integers(0, len(letters), rows.size)]
+
+    lower = case_change & (rng.random(n) < 0.5)
+    upper = case_change & ~lower
+    names[lower] = np.char.lower(names[lower])
+    names[upper] = np.char.upper(names[upper])
+
+    # Age: missing (10%), invalid text (5%), "NN years" (5%) or a plain number
+    age_values = np.arange(18, 76).astype(str)
+    age_years = np.char.add(age_values, ' years')
+    age_index = rng.integers(0, len(age_values), n)
+    ages = np.where(rng.random(n) < 0.1, '',
+                    np.where(rng.random(n) < 0.05, _draw(rng, INVALID_AGE_VALUES, n),
+                             np.where(rng.random(n) < 0.05, age_years[age_index], age_values[age_index])))
+
+    # Gender: weighted choice between inconsistent formats and missing values
+    weights = np.asarray(GENDER_WEIGHTS)
+    genders = np.asarray(GENDER_OPTIONS)[rng.choice(len(GENDER_OPTIONS), n, p=weights / weights.sum())]
+
+    # Location: "City, ST" (70%), city only, missing or "City/ST"
+    cities = _draw(rng, CITIES, n)
+    states = _draw(rng, STATES, n)
+    locations = np.where(rng.random(n) < 0.7, np.char.add(np.char.add(cities, ', '), states),
+                         np.where(rng.random(n) < 0.15, cities,
+                                  np.where(rng.random(n) < 0.1, '', np.char.add(np.char.add(cities, '/'), states))))
+
+    # Purchase Date: every 2023 date the generator can produce, pre-rendered in each of the formats
+    date_formats = ['%m/%d/%Y', '%d-%m-%Y', '%Y.%m.%d', '%B %d, %Y', '%m-%d-%y', '%Y-%m-%d']
+    calendar = [datetime(2023, month, day) for month in range(1, 13) for day in range(1, 29)]
+    date_table = np.array([[''] * len(calendar)] + [[d.strftime(fmt) for d in calendar] for fmt in date_formats])
+    # Bucket 0 is missing (15%), then 15% for each format and 10% ISO
+    format_index = np.searchsorted([0.15, 0.3, 0.45, 0.6, 0.75, 0.9], rng.random(n), side='right')
+    purchase_dates = date_table[format_index, rng.integers(0, len(calendar), n)]
+
+    # Product Category: missing (10%), with a lower/upper case change 30% of the time
+    category_table = np.array([PRODUCT_CATEGORIES,
+                               [c.lower() for c in PRODUCT_CATEGORIES],
+                               [c.upper() for c in PRODUCT_CATEGORIES]])
+    variant = np.where(rng.random(n) < 0.3, np.where(rng.random(n) < 0.5, 1, 2), 0)
+    categories = np.where(rng.random(n) < 0.1, '',
+                          category_table[variant, rng.integers(0, len(PRODUCT_CATEGORIES), n)])
+
+    # Amount Spent: missing, invalid, "$N.NN", integer, "N,NN" or "N.NN" (see generate_unclean_data)
+    amount_kind = np.searchsorted([0.1, 0.2, 0.4, 0.6, 0.8], rng.random(n), side='right')
+    amounts = np.full(n, '', dtype='U16')
+
+    def format_cents(count):
+        cents = np.round(rng.uniform(10, 1000, count) * 100).astype(np.int64)
+        return np.char.add(np.char.add((cents // 100).astype(str), '.'),
+                           np.char.zfill((cents % 100).astype(str), 2))
+
+    for kind in range(1, 6):
+        mask = amount_kind == kind
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        if kind == 1:  # Invalid
+            amounts[mask] = _draw(rng, INVALID_AMOUNT_VALUES, count)
+        elif kind == 2:  # Currency symbol
+            amounts[mask] = np.char.add('$', format_cents(count))
+        elif kind == 3:  # Integer
+            amounts[mask] = rng.uniform(10, 1000, count).astype(np.int64).astype(str)
+        elif kind == 4:  # Decimal with comma as decimal separator
+            whole = rng.uniform(10, 1000, count).astype(np.int64).astype(str)
+            fraction = np.char.zfill(rng.uniform(0, 100, count).astype(np.int64).astype(str), 2)
+            amounts[mask] = np.char.add(np.char.add(whole, ','), fraction)
         else:  # Normal decimal
-            amount_spent = f"{random.uniform(10, 1000):.2f}"
+            amounts[mask] = format_cents(count)
 
-        # Compile the record with all its intentional imperfections
-        record = [str(customer_id), name, age, gender, location, purchase_date_str, product_category, amount_spent]
-        data.append(record)
+    columns = [customer_ids, names, ages, genders, locations, purchase_dates, categories, amounts]
+    return pd.DataFrame(dict(zip(HEADER, columns)))
 
-    return data
+def generate_unclean_chunks(num_records=100, chunk_size=10000, vectorized=False, seed=None, first_id=1):
+    """
+    Generate unclean records lazily in fixed-size chunks
+
+    Only one chunk is held in memory at a time, so the consumer can insert
+    each chunk while the next one is being generated. With a seed, every
+    chunk of the NumPy engine is seeded from (seed, first CustomerID), so a
+    resumed run generates exactly the chunks an uninterrupted run would have.
 
-def insert_into_sqlserver(data, server, database):
+    Args:
+        num_records (int): Total number of records to generate
+        chunk_size (int): Number of records per chunk
+        vectorized (bool): Use the NumPy engine instead of the per-record loop
+        seed (int): Seed for the NumPy engine, None for fresh entropy
+        first_id (int): CustomerID to start at, after the chunks a previous run completed
+
+    Yields:
+        list: Records (without header) for CustomerIDs in the next chunk
     """
-    Insert generated unclean data into SQL Server database
+    print(f"Generating unclean data in chunks of {chunk_size}...")
+
+    # Without a seed, one generator for the whole run continues the same random stream
+    rng = np.random.default_rng(seed)
+
+    for start_id in range(first_id, num_records + 1, chunk_size):
+        size = min(chunk_size, num_records - start_id + 1)
+        with metrics.stage('generate', size):
+            if vectorized:
+                chunk_rng = np.random.default_rng([seed, start_id]) if seed is not None else rng
+                chunk = generate_unclean_data_vectorized(size, seed=chunk_rng, start_id=start_id).values.tolist()
+            else:
+                chunk = [_generate_record(i) for i in range(start_id, start_id + size)]
+        yield chunk
+
+def unclean_table_definition(metadata=None):
+    """
+    Build the SQLAlchemy definition of the UncleanCustomers table
 
     Args:
-        data (list): Generated data to insert
-        server (str): SQL Server instance name
-        database (str): Target database name
+        metadata (sqlalchemy.MetaData): Metadata to attach the table to, a new one if None
 
     Returns:
-        bool: Success status of data insertion
+        sqlalchemy.Table: Table definition
+    """
+    # Flexible NVARCHAR columns to handle various data formats
+    return Table('UncleanCustomers', metadata if metadata is not None else MetaData(),
+                 Column('CustomerID', Integer, primary_key=True, autoincrement=False),
+                 Column('Name', NVARCHAR(100)),
+                 Column('Age', NVARCHAR(50)),
+                 Column('Gender', NVARCHAR(50)),
+                 Column('Location', NVARCHAR(100)),
+                 Column('PurchaseDate', NVARCHAR(50)),
+                 Column('ProductCategory', NVARCHAR(50)),
+                 Column('AmountSpent', NVARCHAR(50)))
+
+def _create_unclean_table(engine):
+    """
+    Drop and recreate the UncleanCustomers table
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Engine for the target database
+    """
+    table = unclean_table_definition()
+
+    # Drop existing table if it exists to start fresh
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+def records_to_frame(records):
+    """
+    Convert generated records to a DataFrame typed like UncleanCustomers
+
+    Args:
+        records (list): Records to convert, without header
+
+    Returns:
+        pandas.DataFrame: Integer CustomerID with every other column as text
+    """
+    frame = pd.DataFrame(records, columns=HEADER)
+    frame['CustomerID'] = frame['CustomerID'].astype('int64')
+
+    # Ages and amounts mix numbers with placeholder strings, store them as text like NVARCHAR does
+    for column in HEADER[1:]:
+        frame[column] = frame[column].astype('string')
+    return frame
+
+# Parameterized insert shared by the row-by-row and bulk paths
+INSERT_SQL = """
+INSERT INTO UncleanCustomers (CustomerID, Name, Age, Gender, Location, PurchaseDate, ProductCategory, AmountSpent)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _insert_records(conn, cursor, records, inserted_count=0):
+    """
+    Insert records into the UncleanCustomers table row by row
+
+    Args:
+        conn (pyodbc.Connection): Open database connection
+        cursor (pyodbc.Cursor): Cursor on the connection
+        records (list): Records to insert, without header
+        inserted_count (int): Records inserted so far, used for batch commits
+
+    Returns:
+        int: Updated count of inserted records
+    """
+    # Insert data row by row with error handling
+    for record in records:
+        try:
+            with metrics.round_trip('INSERT'):
+                cursor.execute(INSERT_SQL, record)
+            inserted_count += 1
+
+            # Commit in batches for performance
+            if inserted_count % 50 == 0:
+                conn.commit()
+                print(f"Inserted {inserted_count} records...")
+
+        except Exception as e:
+            print(f"Error inserting record {record[0]}: {e}")
+            continue
+
+    return inserted_count
+
+def _insert_batch(conn, cursor, batch):
     """
-    print(f"Connecting to SQL Server: {server}, Database: {database}...")
+    Insert a batch with one executemany call, bisecting it on failure
+
+    A failed batch is rolled back and split in half until the offending
+    records are isolated, so each bad record is still reported by CustomerID.
 
-    # Create connection string for Windows Authentication
-    conn_str = f'DRIVER={{SQL Server}};SERVER={server};DATABASE={database};Trusted_Connection=yes;'
+    Args:
+        conn (pyodbc.Connection): Open database connection
+        cursor (pyodbc.Cursor): Cursor on the connection
+        batch (list): Records to insert, without header
 
+    Returns:
+        int: Number of records inserted from the batch
+    """
     try:
-        # Establish database connection
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-
-        # Drop existing table if it exists to start fresh
-        cursor.execute("""
-        IF OBJECT_ID('UncleanCustomers', 'U') IS NOT NULL
-            DROP TABLE UncleanCustomers
-        """)
+        with metrics.round_trip('INSERT executemany'):
+            cursor.executemany(INSERT_SQL, batch)
         conn.commit()
+        return len(batch)
+    except Exception as e:
+        conn.rollback()
+        if len(batch) == 1:
+            print(f"Error inserting record {batch[0][0]}: {e}")
+            return 0
 
-        # Create table with flexible NVARCHAR columns to handle various data formats
-        cursor.execute("""
-        CREATE TABLE UncleanCustomers (
-            CustomerID INT PRIMARY KEY,
-            Name NVARCHAR(100),
-            Age NVARCHAR(50),
-            Gender NVARCHAR(50),
-            Location NVARCHAR(100),
-            PurchaseDate NVARCHAR(50),
-            ProductCategory NVARCHAR(50),
-            AmountSpent NVARCHAR(50)
-        )
-        """)
-        conn.commit()
+    middle = len(batch) // 2
+    return _insert_batch(conn, cursor, batch[:middle]) + _insert_batch(conn, cursor, batch[middle:])
 
-        print("Inserting data into SQL Server...")
+def _bulk_insert_records(conn, cursor, records, batch_size, inserted_count=0):
+    """
+    Insert records into the UncleanCustomers table in large parameter arrays
 
-        # Insert data row by row with error handling
-        inserted_count = 0
-        for record in data[1:]:  # Skip header row
-            try:
-                cursor.execute("""
-                INSERT INTO UncleanCustomers (CustomerID, Name, Age, Gender, Location, PurchaseDate, ProductCategory, AmountSpent)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, record)
-                inserted_count += 1
+    Args:
+        conn (pyodbc.Connection): Open database connection
+        cursor (pyodbc.Cursor): Cursor on the connection
+        records (list): Records to insert, without header
+        batch_size (int): Number of records sent per executemany call
+        inserted_count (int): Records inserted so far, used for progress output
+
+    Returns:
+        int: Updated count of inserted records
+    """
+    for start in range(0, len(records), batch_size):
+        inserted_count += _insert_batch(conn, cursor, records[start:start + batch_size])
+        print(f"Inserted {inserted_count} records...")
 
-                # Commit in batches for performance
-                if inserted_count % 50 == 0:
-                    conn.commit()
-                    print(f"Inserted {inserted_count} records...")
+    return inserted_count
 
-            except Exception as e:
-                print(f"Error inserting record {record[0]}: {e}")
-                continue
+def insert_chunks(conn, chunks, batch_size=None, checkpoint_job=None):
+    """
+    Insert chunks of records into an existing UncleanCustomers table
+
+    Works with any DB-API connection using qmark parameters (pyodbc, sqlite3),
+    so the insert logic can be exercised against a local stand-in database.
+
+    Args:
+        conn: Open DB-API database connection
+        chunks (iterable): Iterable of record lists, without header
+        batch_size (int): Records per bulk executemany call, None to insert row by row
+        checkpoint_job (str): Record each chunk in RunCheckpoints under this job, None to skip
+
+    Returns:
+        int: Number of records inserted
+    """
+    cursor = conn.cursor()
+
+    # pyodbc sends the whole parameter array in one round-trip with fast_executemany
+    if batch_size and hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+
+    inserted_count = 0
+    for chunk in chunks:
+        with metrics.stage('insert', len(chunk)):
+            chunk_start_count = inserted_count
+            if batch_size:
+                inserted_count = _bulk_insert_records(conn, cursor, chunk, batch_size, inserted_count)
+            else:
+                inserted_count = _insert_records(conn, cursor, chunk, inserted_count)
+            if checkpoint_job and chunk:
+                # Records come in CustomerID order, the checkpoint commits with the chunk's last rows
+                record_checkpoint_raw(cursor, checkpoint_job, chunk[0][0], chunk[-1][0],
+                                      inserted_count - chunk_start_count)
+            # Earlier batches of the chunk are already committed (every batch in bulk mode, every
+            # 50 rows otherwise), so a failed chunk can leave rows above the last checkpoint;
+            # prepare_resume discards them
+            conn.commit()
+
+    cursor.close()
+    return inserted_count
+
+# Job name of the ingestion's rows in RunCheckpoints
+INGEST_JOB = 'ingest UncleanCustomers'
+
+def _insert_chunks_into_database(chunks, backend, batch_size=None, resume_after=None):
+    """
+    Recreate UncleanCustomers in a SQL database and insert the chunks over DB-API
+
+    Args:
+        chunks (iterable): Iterable of record lists, without header
+        backend (SQLAlchemyBackend): Target database
+        batch_size (int): Records per bulk executemany call, None to insert row by row
+        resume_after (int): Checkpoint every chunk and keep the rows up to this CustomerID
+            (0 starts a resumable run from scratch), None to run without checkpoints
+
+    Returns:
+        int: Number of records inserted
+    """
+    engine = backend.create_engine()
+    if not resume_after:
+        _create_unclean_table(engine)
+        # Progress of an earlier run no longer matches the new table
+        clear_checkpoints(engine, INGEST_JOB)
+
+    print(f"Inserting data into {backend.kind}...")
+
+    conn = backend.raw_connection()
+    try:
+        inserted_count = insert_chunks(conn, chunks, batch_size, INGEST_JOB if resume_after is not None else None)
 
         # Final commit to ensure all data is saved
         conn.commit()
+    finally:
+        conn.close()
+
+    if resume_after is not None:
+        # The run is complete, the next resumable run starts a fresh table
+        clear_checkpoints(engine, INGEST_JOB)
+
+    return inserted_count
+
+def _write_chunks_to_storage(chunks, backend):
+    """
+    Write the chunks as DataFrames to a backend without a DB-API insert path
+
+    Args:
+        chunks (iterable): Iterable of record lists, without header
+        backend (StorageBackend): Target storage
+
+    Returns:
+        int: Number of records written
+    """
+    print(f"Writing data to {backend.kind}...")
+
+    inserted_count = 0
+    for number, chunk in enumerate(chunks):
+        # The first chunk replaces any previous table, later chunks are appended
+        with metrics.stage('insert', len(chunk)):
+            backend.write_table(records_to_frame(chunk), 'UncleanCustomers', 'replace' if number == 0 else 'append')
+        inserted_count += len(chunk)
+        print(f"Inserted {inserted_count} records...")
+
+    return inserted_count
+
+def insert_chunks_into_backend(chunks, backend, batch_size=None, resume_after=None):
+    """
+    Insert chunks of generated unclean data into a storage backend
+
+    Chunks are consumed as they arrive, so a lazy generator such as
+    generate_unclean_chunks keeps memory bounded by the chunk size.
+
+    Args:
+        chunks (iterable): Iterable of record lists, without header
+        backend (StorageBackend): Target storage
+        batch_size (int): Records per bulk executemany call on SQL backends, None to insert row by row
+        resume_after (int): Resume point from checkpoint.prepare_resume on SQL backends, None to run without checkpoints
+
+    Returns:
+        bool: Success status of data insertion
+    """
+    print(f"Connecting to {backend.kind}: {backend}...")
+
+    try:
+        if isinstance(backend, SQLAlchemyBackend):
+            inserted_count = _insert_chunks_into_database(chunks, backend, batch_size, resume_after)
+        else:
+            inserted_count = _write_chunks_to_storage(chunks, backend)
         print(f"Successfully inserted {inserted_count} records into the UncleanCustomers table.")
 
         # Sample and display a few records to verify insertion
-        cursor.execute("SELECT TOP 5 * FROM UncleanCustomers")
-        rows = cursor.fetchall()
+        sample_chunks = backend.read_table('UncleanCustomers', chunksize=5)
+        sample = next(sample_chunks, None)
+        sample_chunks.close()
         print("\nSample data from the UncleanCustomers table:")
-        for row in rows:
+        for row in (sample.itertuples(index=False, name=None) if sample is not None else []):
             print(row)
 
-        cursor.close()
-        conn.close()
-
     except Exception as e:
-        print(f"Error connecting to or inserting into SQL Server: {e}")
+        print(f"Error connecting to or inserting into {backend.kind}: {e}")
         return False
 
     return True
 
-def main():
+def insert_chunks_into_sqlserver(chunks, server, database, batch_size=None):
     """
-    Main function to orchestrate the unclean data generation and insertion process
+    Insert chunks of generated unclean data into SQL Server database
+
+    Args:
+        chunks (iterable): Iterable of record lists, without header
+        server (str): SQL Server instance name
+        database (str): Target database name
+        batch_size (int): Records per bulk executemany call, None to insert row by row
+
+    Returns:
+        bool: Success status of data insertion
+    """
+    return insert_chunks_into_backend(chunks, SQLServerBackend(server, database), batch_size)
+
+def insert_into_sqlserver(data, server, database, batch_size=None):
+    """
+    Insert generated unclean data into SQL Server database
+
+    Args:
+        data (list): Generated data to insert
+        server (str): SQL Server instance name
+        database (str): Target database name
+        batch_size (int): Records per bulk executemany call, None to insert row by row
+
+    Returns:
+        bool: Success status of data insertion
+    """
+    # Skip header row and insert the records as a single chunk
+    return insert_chunks_into_sqlserver([data[1:]], server, database, batch_size)
+
+def parse_args(argv=None):
+    """
+    Parse command line options for the generation and insertion process
+
+    Args:
+        argv (list): Arguments to parse, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Generate unclean customer data and load it into SQL Server")
+    parser.add_argument("--num-records", type=int, default=200, help="Number of records to generate")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Generate and insert in chunks of this many records to keep memory bounded")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Bulk insert this many records per round-trip instead of row by row")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Generate the next chunks in a background thread while inserting (needs --chunk-size)")
+    parser.add_argument("--pipeline-depth", type=int, default=DEFAULT_DEPTH,
+                        help="Chunks generated ahead of the insert, bounds memory")
+    parser.add_argument("--resume", action="store_true",
+                        help="Checkpoint every chunk and continue after the last one a failed run completed "
+                             "(needs --chunk-size and a SQL database)")
+    parser.add_argument("--vectorized", action="store_true", help="Use the NumPy generation engine")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the NumPy generation engine")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="sqlserver",
+                        help="Storage to load the generated table into")
+    parser.add_argument("--path", default=None,
+                        help="Database file or Parquet directory for the sqlite, duckdb and parquet backends")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Connections kept open in the shared pool per database")
+    parser.add_argument("--no-pool-pre-ping", action="store_true",
+                        help="Skip the liveness check on pooled connections before reuse")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Append per-stage timings, memory and DB round-trips of the run to this JSON lines file")
+    parser.add_argument("--profile", default=None,
+                        help="Profile the run with cProfile and write the stats to this file")
+    return parser.parse_args(argv)
+
+def run_ingestion(args):
+    """
+    Run the unclean data generation and insertion process for parsed command line options
+
+    Args:
+        args (argparse.Namespace): Options from parse_args
     """
     # Configuration parameters
     server = r"LAPTOP-D00LK2I0\SQLEXPRESS01"  # SQL Server instance
     database = "Customer Analysis"  # Target database
-    num_records = 200  # Number of records to generate
+    num_records = args.num_records  # Number of records to generate
+    configure_pool(args.pool_size, pre_ping=not args.no_pool_pre_ping)
+    backend = get_backend(args.backend, server, database, args.path)
 
     # Print process details
     print(f"Starting unclean data generation and import process...")
-    print(f"Target: SQL Server {server}, Database: {database}")
+    print(f"Target: {backend.kind} {backend}")
     print(f"Number of records to generate: {num_records}")
 
-    # Generate unclean data
-    unclean_data = generate_unclean_data(num_records)
-    print(f"Generated {len(unclean_data)-1} records of unclean data")
+    if args.pipeline and not args.chunk_size:
+        print("--pipeline needs --chunk-size, running the stages in turn")
+
+    if args.resume and not (args.chunk_size and isinstance(backend, SQLAlchemyBackend)):
+        print(f"--resume needs --chunk-size and a SQL database, it is not supported on the {backend.kind} backend")
+        return
 
-    # Insert data into SQL Server
-    success = insert_into_sqlserver(unclean_data, server, database)
+    if args.chunk_size:
+        resume_after = None
+        if args.resume:
+            try:
+                resume_after = prepare_resume(backend, INGEST_JOB, 'UncleanCustomers')
+            except Exception as e:
+                print(f"Error reading checkpoints from {backend.kind}: {e}")
+                return
+
+        # Stream chunks straight into the insert so generation and loading overlap
+        chunks = generate_unclean_chunks(num_records, args.chunk_size, args.vectorized, args.seed,
+                                         first_id=(resume_after or 0) + 1)
+        if args.pipeline:
+            # Generate in a background thread, at most pipeline_depth chunks ahead of the insert
+            chunks = prefetch(chunks, args.pipeline_depth, 'generate')
+        success = insert_chunks_into_backend(chunks, backend, args.batch_size, resume_after)
+        # Stop generating if the insert gave up early
+        chunks.close()
+    else:
+        # Generate unclean data
+        with metrics.stage('generate', num_records):
+            if args.vectorized:
+                frame = generate_unclean_data_vectorized(num_records, seed=args.seed)
+                unclean_data = [list(HEADER)] + frame.values.tolist()
+            else:
+                unclean_data = generate_unclean_data(num_records)
+        print(f"Generated {len(unclean_data)-1} records of unclean data")
+
+        # Insert data into the selected backend, skipping the header row
+        success = insert_chunks_into_backend([unclean_data[1:]], backend, args.batch_size)
 
     # Print final status
     if success:
         print("\nProcess completed successfully!")
-        print(f"Data has been imported into {database} on {server} in the UncleanCustomers table.")
+        print(f"Data has been imported into {backend} in the UncleanCustomers table.")
     else:
         print("\nProcess completed with errors.")
-        print("Check the error messages above and verify your SQL Server connection details.")
+        print(f"Check the error messages above and verify your {backend.kind} connection details.")
+
+def main(argv=None):
+    """
+    Main function to orchestrate the unclean data generation and insertion process
+    """
+    args = parse_args(argv)
+
+    # Optionally profile the whole run
+    with metrics.profiled(args.profile):
+        run_ingestion(args)
+
+    # Stage timings and round-trips of the run, one JSON line per run
+    if args.metrics_out:
+        metrics.print_summary()
+        metrics.write_metrics(args.metrics_out, 'Ingestion.py', argv if argv is not None else sys.argv[1:])
 
 if __name__ == "__main__":
     main()
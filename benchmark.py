@@ -0,0 +1,339 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import clean
+import Ingestion
+from metrics import peak_rss_mb
+from storage import dispose_engines, get_backend
+
+# Record counts swept by default, from a quick smoke run up to the full 10M
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+
+# Local stand-ins for SQL Server, so the suite runs fully offline
+BENCHMARK_BACKENDS = {'sqlite': 'benchmark.db', 'duckdb': 'benchmark.duckdb', 'parquet': 'parquet'}
+
+# Per-column cleaning steps of each engine, in the order the engine runs them.
+# Each step takes the frame and returns the new column; only Series results are
+# assigned back, so later steps (PurchaseMonth, AgeGroup) see cleaned inputs.
+COLUMN_STEPS = {
+    'python': [
+        ('CustomerID', lambda data: pd.to_numeric(data['CustomerID'], errors='coerce')),
+        ('Name', lambda data: data['Name'].str.strip().str.title()),
+        ('CanonicalName', lambda data: data['Name'].apply(clean.canonical_name)),
+        ('Age', lambda data: data['Age'].apply(clean.clean_age)),
+        ('Gender', lambda data: data['Gender'].apply(clean.standardize_gender)),
+        ('Location', lambda data: data.apply(lambda row: pd.Series(clean.extract_state(row['Location'])), axis=1)),
+        ('PurchaseDate', lambda data: data['PurchaseDate'].apply(clean.clean_date)),
+        ('PurchaseMonth', lambda data: data['PurchaseDate'].apply(lambda x: x.strftime('%b') if x is not None else None)),
+        ('ProductCategory', lambda data: data['ProductCategory'].str.strip().str.title()),
+        ('AmountSpent', lambda data: data['AmountSpent'].apply(clean.clean_amount)),
+        ('AgeGroup', lambda data: data['Age'].apply(clean.get_age_group)),
+    ],
+    'vectorized': [
+        ('CustomerID', lambda data: pd.to_numeric(data['CustomerID'], errors='coerce')),
+        ('Name', lambda data: data['Name'].str.strip().str.title()),
+        ('CanonicalName', lambda data: clean._canonical_name_column(data['Name'])),
+        ('Age', lambda data: clean._clean_age_column(data['Age'])),
+        ('Gender', lambda data: clean._standardize_gender_column(data['Gender'])),
+        ('Location', lambda data: clean._extract_state_columns(data['Location'])),
+        ('PurchaseDate', lambda data: clean.parse_purchase_dates(data['PurchaseDate'])[0]),
+        ('PurchaseMonth', lambda data: data['PurchaseDate'].dt.strftime('%b')),
+        ('ProductCategory', lambda data: data['ProductCategory'].str.strip().str.title()),
+        ('AmountSpent', lambda data: clean._clean_amount_column(data['AmountSpent'])),
+        ('AgeGroup', lambda data: clean._age_group_column(data['Age'])),
+    ],
+    'arrow': [
+        ('CustomerID', lambda data: pd.to_numeric(data['CustomerID'], errors='coerce')),
+        ('Name', lambda data: clean._arrow_title_column(data['Name'])),
+        ('CanonicalName', lambda data: clean._arrow_canonical_name_column(data['Name'])),
+        ('Age', lambda data: clean._arrow_clean_age_column(data['Age'])),
+        ('Gender', lambda data: clean._arrow_standardize_gender_column(data['Gender'])),
+        ('Location', lambda data: clean._arrow_extract_state_columns(data['Location'])),
+        # Month comes out of the same pass over the distinct dates
+        ('PurchaseDate', lambda data: clean._arrow_parse_purchase_dates(data['PurchaseDate'])[0]),
+        ('ProductCategory', lambda data: clean._arrow_title_column(data['ProductCategory'])),
+        ('AmountSpent', lambda data: clean._arrow_clean_amount_column(data['AmountSpent'])),
+        ('AgeGroup', lambda data: clean._arrow_age_group_column(data['Age'])),
+    ],
+}
+
+@contextlib.contextmanager
+def timed_stage(stages, name, records):
+    """
+    Time a block and record it as a stage result
+
+    The pipeline's own progress output is discarded while the block runs, so
+    terminal I/O is not part of the measurement.
+
+    Args:
+        stages (dict): Stage results to add to
+        name (str): Stage name
+        records (int): Rows handled by the stage, for rows per second
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+
+    stages[name] = {
+        'seconds': round(seconds, 6),
+        'rows_per_second': round(records / seconds, 1) if seconds else None,
+        # High-water mark of the whole run up to the end of this stage
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def _record_chunks(frame, chunk_size):
+    """
+    Slice generated data into record lists for the insert path
+
+    Args:
+        frame (pandas.DataFrame or list): Vectorized frame, or loop records with header
+        chunk_size (int): Records per chunk
+
+    Yields:
+        list: Next chunk of records, without header
+    """
+    if isinstance(frame, list):
+        for start in range(1, len(frame), chunk_size):
+            yield frame[start:start + chunk_size]
+    else:
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size].values.tolist()
+
+def run_pipeline(num_records, options, workdir):
+    """
+    Run generate -> ingest -> load -> clean -> write once and time every stage
+
+    Args:
+        num_records (int): Number of records to generate
+        options (dict): Benchmark options from parse_args
+        workdir (str): Directory holding the local database or Parquet files
+
+    Returns:
+        dict: Stage name to seconds, rows per second and peak RSS
+    """
+    stages = {}
+    backend = get_backend(options['backend'], path=os.path.join(workdir, BENCHMARK_BACKENDS[options['backend']]))
+
+    with timed_stage(stages, 'generate', num_records):
+        if options['generator'] == 'vectorized':
+            generated = Ingestion.generate_unclean_data_vectorized(num_records, seed=options['seed'])
+        else:
+            generated = Ingestion.generate_unclean_data(num_records)
+
+    with timed_stage(stages, 'ingest', num_records):
+        chunks = _record_chunks(generated, options['chunk_size'])
+        if not Ingestion.insert_chunks_into_backend(chunks, backend, options['batch_size']):
+            raise RuntimeError("Ingest stage failed")
+    del generated
+
+    with timed_stage(stages, 'load', num_records):
+        data = clean.load_unclean_data(None, None, 'UncleanCustomers', backend=backend)
+        if data is None:
+            raise RuntimeError("Load stage failed")
+
+    # Per-column steps run on a copy so the full engine below starts from the raw load
+    columns = data.copy()
+    for column, step in COLUMN_STEPS[options['engine']]:
+        with timed_stage(stages, f'clean.{column}', num_records):
+            result = step(columns)
+        if isinstance(result, pd.Series):
+            columns[column] = result
+    del columns
+
+    with timed_stage(stages, 'clean', num_records):
+        cleaned = clean.run_cleaning_engine(data, options['engine'], options['workers'])
+
+    with timed_stage(stages, 'schema', num_records):
+        cleaned = clean.apply_clean_schema(cleaned)
+
+    with timed_stage(stages, 'write', num_records):
+        if not clean.write_clean_data_to_sql(cleaned, None, None, 'CleanedCustomers', fast=options['fast_write'],
+                                             chunksize=options['write_chunksize'], backend=backend):
+            raise RuntimeError("Write stage failed")
+
+    return stages
+
+def benchmark_size(num_records, options):
+    """
+    Benchmark one record count, keeping the best time of each stage over the repeats
+
+    Runs in its own process so the peak RSS belongs to this record count alone.
+
+    Args:
+        num_records (int): Number of records to generate
+        options (dict): Benchmark options from parse_args
+
+    Returns:
+        dict: Record count, per-stage results and overall peak RSS
+    """
+    best = {}
+    for _ in range(options['repeat']):
+        workdir = tempfile.mkdtemp(prefix='benchmark-', dir=options['workdir'])
+        try:
+            stages = run_pipeline(num_records, options, workdir)
+        finally:
+            # Close the pooled connections to the scratch database before deleting it
+            dispose_engines()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        for name, result in stages.items():
+            if name not in best or result['seconds'] < best[name]['seconds']:
+                best[name] = result
+
+    return {'records': num_records, 'stages': best, 'peak_rss_mb': peak_rss_mb()}
+
+def run_benchmarks(options):
+    """
+    Sweep all record counts, each in a fresh worker process
+
+    Args:
+        options (dict): Benchmark options from parse_args
+
+    Returns:
+        dict: Run metadata and one result per record count
+    """
+    results = []
+    for num_records in options['sizes']:
+        print(f"Benchmarking {num_records} records...")
+        # A fresh spawned process per size keeps the RSS high-water mark separate
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(benchmark_size, num_records, options).result()
+        print_result(result)
+        results.append(result)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'options': options,
+        'results': results,
+    }
+
+def print_result(result):
+    """
+    Print the stage timings of one record count
+
+    Args:
+        result (dict): Result from benchmark_size
+    """
+    for name, stage in result['stages'].items():
+        rate = f"{stage['rows_per_second']:>14,.0f} rows/s" if stage['rows_per_second'] else ""
+        print(f"  {name:<22} {stage['seconds']:>10.3f}s {rate}")
+    if result['peak_rss_mb'] is not None:
+        print(f"  {'peak RSS':<22} {result['peak_rss_mb']:>10.1f} MiB")
+
+def compare_to_baseline(current, baseline, tolerance):
+    """
+    Compare stage times and peak RSS against a stored baseline run
+
+    Args:
+        current (dict): Results from run_benchmarks
+        baseline (dict): Results loaded from a previous run
+        tolerance (float): Allowed relative slowdown before a stage counts as a regression
+
+    Returns:
+        list: (records, metric, baseline value, current value) for each regression
+    """
+    baseline_results = {result['records']: result for result in baseline['results']}
+    regressions = []
+
+    print(f"\nComparison with baseline from {baseline.get('created', 'unknown date')}:")
+    changed = sorted(key for key, value in current['options'].items()
+                     if key not in ('sizes', 'workdir') and baseline.get('options', {}).get(key) != value)
+    if changed:
+        print(f"  Warning: options differ from the baseline run: {', '.join(changed)}")
+    for result in current['results']:
+        previous = baseline_results.get(result['records'])
+        if previous is None:
+            continue
+
+        metrics = [(name, previous['stages'][name]['seconds'], stage['seconds'])
+                   for name, stage in result['stages'].items() if name in previous['stages']]
+        if result['peak_rss_mb'] is not None and previous.get('peak_rss_mb') is not None:
+            metrics.append(('peak_rss_mb', previous['peak_rss_mb'], result['peak_rss_mb']))
+
+        for name, before, after in metrics:
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append((result['records'], name, before, after))
+            print(f"  {result['records']:>10} {name:<22} {before:>10.3f} -> {after:>10.3f} ({change:+.1%}){flag}")
+
+    return regressions
+
+def parse_args(argv=None):
+    """
+    Parse command line options for the benchmark suite
+
+    Args:
+        argv (list): Arguments to parse, defaults to sys.argv
+
+    Returns:
+        argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Benchmark generate -> ingest -> clean -> write offline")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(',')], default=DEFAULT_SIZES,
+                        help="Comma separated record counts to sweep")
+    parser.add_argument("--backend", choices=sorted(BENCHMARK_BACKENDS), default="sqlite",
+                        help="Local storage standing in for SQL Server")
+    parser.add_argument("--engine", choices=sorted(clean.CLEANING_ENGINES), default="vectorized",
+                        help="Cleaning engine to benchmark")
+    parser.add_argument("--generator", choices=["loop", "vectorized"], default="vectorized",
+                        help="Generation engine to benchmark")
+    parser.add_argument("--workers", type=int, default=None, help="Clean in this many worker processes")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the vectorized generator")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Records per ingest chunk")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Records per executemany call on ingest")
+    parser.add_argument("--fast-write", action="store_true", help="Benchmark the staging table write path")
+    parser.add_argument("--write-chunksize", type=int, default=None, help="Rows per to_sql batch on write")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size, the fastest time per stage is kept")
+    parser.add_argument("--workdir", default=None, help="Directory for the temporary databases")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown allowed before a stage is reported as a regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Main function to run the benchmark sweep and compare it with a baseline
+
+    Returns:
+        int: Exit status, 1 when a regression against the baseline was found
+    """
+    args = parse_args(argv)
+    options = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'tolerance')}
+
+    results = run_benchmarks(options)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} of the baseline.")
+            return 1
+        print("\nNo regressions against the baseline.")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
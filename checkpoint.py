@@ -0,0 +1,124 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, inspect, select, text
+
+# Progress table: one row per committed chunk of a resumable job, by CustomerID range
+checkpoint_metadata = MetaData()
+checkpoint_table = Table(
+    'RunCheckpoints', checkpoint_metadata,
+    Column('Job', String(128), primary_key=True),
+    Column('FirstCustomerID', Integer, primary_key=True, autoincrement=False),
+    Column('LastCustomerID', Integer, nullable=False),
+    Column('Rows', Integer, nullable=False),
+    Column('CompletedAt', DateTime, nullable=False),
+)
+
+# Parameterized insert for DB-API cursors, so a chunk and its checkpoint commit together
+CHECKPOINT_INSERT_SQL = """
+INSERT INTO RunCheckpoints (Job, FirstCustomerID, LastCustomerID, Rows, CompletedAt)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+def get_resume_point(engine, job):
+    """
+    Highest CustomerID a job has committed, creating the progress table if needed
+
+    Jobs work through CustomerIDs in ascending order, so everything up to
+    this point is done and a resumed run continues after it.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Database engine
+        job (str): Job name
+
+    Returns:
+        int: Last committed CustomerID, 0 when the job has no checkpoints
+    """
+    checkpoint_metadata.create_all(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        query = select(func.max(checkpoint_table.c.LastCustomerID)).where(checkpoint_table.c.Job == job)
+        last_customer_id = conn.execute(query).scalar()
+
+    return last_customer_id or 0
+
+def record_checkpoint(conn, job, first_customer_id, last_customer_id, rows):
+    """
+    Record a committed chunk of a job
+
+    Args:
+        conn (sqlalchemy.engine.Connection): Connection inside the caller's transaction
+        job (str): Job name
+        first_customer_id (int): First CustomerID of the chunk
+        last_customer_id (int): Last CustomerID of the chunk
+        rows (int): Rows written for the chunk
+    """
+    conn.execute(checkpoint_table.insert().values(
+        Job=job, FirstCustomerID=first_customer_id, LastCustomerID=last_customer_id, Rows=rows,
+        CompletedAt=datetime.now()))
+
+def record_checkpoint_raw(cursor, job, first_customer_id, last_customer_id, rows):
+    """
+    Record a committed chunk of a job on a DB-API cursor (qmark parameters)
+
+    Args:
+        cursor: Cursor on the connection that inserted the chunk, committed by the caller
+        job (str): Job name
+        first_customer_id (int): First CustomerID of the chunk
+        last_customer_id (int): Last CustomerID of the chunk
+        rows (int): Rows written for the chunk
+    """
+    cursor.execute(CHECKPOINT_INSERT_SQL, (job, first_customer_id, last_customer_id, rows, datetime.now()))
+
+def clear_checkpoints(engine, job):
+    """
+    Forget the progress of a job, once its table is being rebuilt from scratch
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Database engine
+        job (str): Job name
+    """
+    if not inspect(engine).has_table(checkpoint_table.name):
+        return
+    with engine.begin() as conn:
+        conn.execute(delete(checkpoint_table).where(checkpoint_table.c.Job == job))
+
+def discard_partial_chunk(engine, table_name, last_customer_id):
+    """
+    Delete rows written after the last checkpoint, e.g. half of a chunk a killed run left behind
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Database engine
+        table_name (str): Table the job writes to
+        last_customer_id (int): Resume point from get_resume_point
+
+    Returns:
+        int: Number of rows deleted
+    """
+    with engine.begin() as conn:
+        result = conn.execute(text(f"DELETE FROM {table_name} WHERE CustomerID > :last"),
+                              {'last': last_customer_id})
+    return result.rowcount
+
+def prepare_resume(backend, job, table_name):
+    """
+    Find where a checkpointed job stopped and drop what it left half-written
+
+    Args:
+        backend (SQLAlchemyBackend): Database holding the job's table
+        job (str): Job name
+        table_name (str): Table the job writes to
+
+    Returns:
+        int: Last CustomerID of the completed chunks, 0 to start from scratch
+    """
+    engine = backend.create_engine()
+    resume_after = get_resume_point(engine, job)
+    if resume_after and not backend.has_table(table_name):
+        # The table was dropped since, its checkpoints are stale
+        resume_after = 0
+
+    if resume_after:
+        discarded = discard_partial_chunk(engine, table_name, resume_after)
+        print(f"Resuming {job} after CustomerID {resume_after} ({discarded} rows of an unfinished chunk discarded)")
+    else:
+        clear_checkpoints(engine, job)
+    return resume_after
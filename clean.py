@@ -1,295 +1,2023 @@
+import argparse
+import hashlib
+import os
+import re
+import string
+import sys
+import numpy as np
 import pandas as pd
-import pyodbc
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
+from pandas.api.types import CategoricalDtype
+from sqlalchemy import BigInteger, Column, Date, DateTime, Integer, MetaData, NVARCHAR, Numeric, SmallInteger, String, Table, inspect, select, text
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import metrics
+from checkpoint import clear_checkpoints, prepare_resume, record_checkpoint
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # Optional: only needed for the arrow cleaning engine
+    pa = pc = None
+
+from export import DEFAULT_ROW_GROUP_SIZE, close_extract_writers, open_extract_writers, write_extracts
+from pipeline import DEFAULT_DEPTH, prefetch
+from reference_data import lookup_city, lookup_name_token, lookup_state
+from spend_cube import combine_cube_frames, cube_frame, cube_table_name, write_spend_cube
+from storage import BACKENDS, SQLAlchemyBackend, SQLServerBackend, configure_pool, get_backend
+
+def resolve_backend(server_name, database_name, backend=None):
+    """
+    Pick the storage backend for a load or write call
+
+    Args:
+    server_name (str): Name of the SQL Server instance
+    database_name (str): Name of the database
+    backend (StorageBackend): Explicit backend, overrides server and database
+
+    Returns:
+    StorageBackend: The explicit backend, or SQL Server for the server and database
+    """
+    if backend is not None:
+        return backend
+    return SQLServerBackend(server_name, database_name)
+
+def load_unclean_data(server_name, database_name, table_name, backend=None):
+    """
+    Load unclean data from SQL Server database
+
+    Args:
+    server_name (str): Name of the SQL Server instance
+    database_name (str): Name of the database
+    table_name (str): Name of the table to load data from
+    backend (StorageBackend): Load from this backend instead of SQL Server
+
+    Returns:
+    pandas.DataFrame: Loaded data or None if loading fails
+    """
+    backend = resolve_backend(server_name, database_name, backend)
+    print(f"Loading unclean data from {backend.kind}...")
+
+    try:
+        # Select all records from the specified table
+        with metrics.stage('load') as record:
+            data = backend.read_table(table_name)
+            record['rows'] = len(data)
+
+        print(f"Successfully loaded {len(data)} records from {backend.qualified_name(table_name)}")
+        return data
+
+    except Exception as e:
+        # Handle and log any errors during data loading
+        print(f"Error loading data from {backend.kind}: {str(e)}")
+        return None
+
+def load_unclean_data_chunks(server_name, database_name, table_name, chunksize, backend=None, after=None):
+    """
+    Stream unclean data from SQL Server database in fixed-size chunks
+
+    Rows are fetched from the open result set as each chunk is requested, so
+    only one chunk is held in memory at a time.
+
+    Args:
+    server_name (str): Name of the SQL Server instance
+    database_name (str): Name of the database
+    table_name (str): Name of the table to load data from
+    chunksize (int): Number of rows per chunk
+    backend (StorageBackend): Load from this backend instead of SQL Server
+    after (int): Only stream rows above this CustomerID, in CustomerID order (SQL databases only)
+
+    Yields:
+    pandas.DataFrame: Next chunk of loaded data
+    """
+    backend = resolve_backend(server_name, database_name, backend)
+    print(f"Streaming unclean data from {backend.kind} in chunks of {chunksize}...")
+
+    if after is None:
+        chunks = iter(backend.read_table(table_name, chunksize))
+    else:
+        # Ordered so that every chunk covers the CustomerIDs after the previous one
+        query = text(f"SELECT * FROM {table_name} WHERE CustomerID > :after ORDER BY CustomerID")
+        chunks = iter(backend.read_query(query, chunksize, {'after': after}))
+    while True:
+        # Time each fetch separately from the cleaning done between chunks
+        with metrics.stage('load') as record:
+            chunk = next(chunks, None)
+            record['rows'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+# Date formats accepted in PurchaseDate, in the order they are tried
+DATE_FORMATS = [
+    '%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y', '%Y.%m.%d',
+    '%B %d, %Y', '%m-%d-%y', '%d/%m/%Y', '%m/%d/%y'
+]
+
+# Gender spellings mapped onto their standard value, anything else becomes missing
+GENDER_MAP = {'m': 'Male', 'male': 'Male', 'f': 'Female', 'female': 'Female'}
+
+# Lower bounds of each age group, used with pd.cut (right-open intervals)
+AGE_GROUP_BINS = [float('-inf'), 18, 35, 50, float('inf')]
+AGE_GROUP_LABELS = ['Youth', 'Young', 'Middle', 'Senior']
+
+# Age cleaning function: handles various age input formats
+def clean_age(age):
+    """
+    Extract the ASCII digits of an age value as an integer
+
+    Args:
+    age (str): Raw Age value
+
+    Returns:
+    int: Age, or None when missing or invalid
+    """
+    if pd.isna(age) or age == '':
+        return None
+
+    # Values without digits are invalid, data_quality_report counts them
+    if not any(c in string.digits for c in str(age)):
+        return None
+
+    # Extract only the ASCII digits from age input, like the regex-based engines
+    digit_part = ''.join(c for c in str(age) if c in string.digits)
+    if digit_part:
+        return int(digit_part)  # Convert to integer
+    return None
+
+# Gender standardization function
+def standardize_gender(gender):
+    """
+    Map a gender spelling onto Male/Female
+
+    Args:
+    gender (str): Raw Gender value
+
+    Returns:
+    str: Standard gender, or None
+    """
+    if pd.isna(gender) or gender == '':
+        return None
+    gender = str(gender).strip().lower()
+    if gender in ['m', 'male']:
+        return 'Male'
+    elif gender in ['f', 'female']:
+        return 'Female'
+    return None
+
+# Name canonicalization function
+def canonical_name(name):
+    """
+    Repair each token of a name against the known-names dictionary
+
+    Args:
+    name (str): Name, already stripped and title-cased
+
+    Returns:
+    str: Canonical name, or None when missing
+    """
+    if pd.isna(name) or name == '':
+        return None
+    return ' '.join(lookup_name_token(token) for token in str(name).split())
+
+# Location and State extraction function
+def extract_state(location):
+    """
+    Resolve a location to a normalized "City, ST" form and its state code
+
+    The state after a ',' or '/' is looked up by code or full name in the
+    reference index. When it is missing or unknown, a known city falls back
+    to its home state; otherwise the state is left empty rather than guessed.
+
+    Args:
+    location (str): Raw Location value
+
+    Returns:
+    tuple: (Location, State)
+    """
+    if pd.isna(location) or location == '':
+        return None, None
+
+    location = str(location).strip()
+
+    # Split "City, State" or "City/State" on the first separator
+    city_part, separator, state_part = location.partition(',')
+    if not separator:
+        city_part, separator, state_part = location.partition('/')
+    city_part = city_part.strip()
+
+    state = lookup_state(state_part) if state_part.strip() else None
+    city = lookup_city(city_part)
+    if city is not None:
+        city_part = city[0]
+        # City-only (or unknown state) locations fall back to the city's home state
+        state = state or city[1]
+
+    if state is None:
+        return location, None
+    return f"{city_part}, {state}", state
+
+# Date cleaning function with multiple format support
+def clean_date(date_str):
+    """
+    Parse a date string with the first matching format in DATE_FORMATS
+
+    Args:
+    date_str (str): Raw PurchaseDate value
+
+    Returns:
+    datetime.date: Parsed date, or None
+    """
+    if pd.isna(date_str) or date_str == '':
+        return None
+
+    date_str = str(date_str).strip()
+
+    # Try parsing date with different formats
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+
+    return None
+
+# Amount spent cleaning function
+def clean_amount(amount):
+    """
+    Parse an amount string with currency symbols and decimal commas
+
+    Args:
+    amount (str): Raw AmountSpent value
+
+    Returns:
+    float: Amount, or None when missing or invalid
+    """
+    if pd.isna(amount) or amount == '':
+        return None
+
+    amount_str = str(amount).strip()
+
+    # Values without digits are invalid, data_quality_report counts them
+    if not any(c in string.digits for c in amount_str):
+        return None
+
+    # Remove currency symbols
+    amount_str = amount_str.replace('$', '').replace('€', '').replace('£', '')
+
+    # Replace comma with dot for decimal
+    amount_str = amount_str.replace(',', '.')
+
+    # Extract valid numeric characters
+    cleaned = ''
+    decimal_count = 0
+
+    for char in amount_str:
+        if char in string.digits:
+            cleaned += char
+        elif char == '.' and decimal_count == 0:
+            cleaned += '.'
+            decimal_count += 1
+
+    try:
+        return float(cleaned) if cleaned else None
+    except ValueError:
+        return None
+
+# Age group categorization function
+def get_age_group(age):
+    """
+    Bucket a cleaned age into its age group
+
+    Args:
+    age (float): Cleaned age
+
+    Returns:
+    str: Age group label, or None
+    """
+    if pd.isna(age):
+        return None
+    elif age < 18:
+        return 'Youth'
+    elif age < 35:
+        return 'Young'
+    elif age < 50:
+        return 'Middle'
+    else:
+        return 'Senior'
+
+@metrics.timed('clean', rows=len)
+def clean_data(data):
+    """
+    Clean and transform the input data
+
+    Args:
+    data (pandas.DataFrame): Raw input data to be cleaned
+
+    Returns:
+    pandas.DataFrame: Cleaned and transformed data
+    """
+    print("Cleaning and transforming data...")
+
+    # Convert CustomerID to numeric, coercing errors to NaN
+    data['CustomerID'] = pd.to_numeric(data['CustomerID'], errors='coerce')
+
+    # Clean Name: strip whitespace and convert to title case
+    data['Name'] = data['Name'].str.strip().str.title()
+
+    # Repair typos in the name tokens
+    with metrics.stage('clean.name', len(data)):
+        data['CanonicalName'] = data['Name'].apply(canonical_name)
+
+    # Apply age cleaning
+    with metrics.stage('clean.age', len(data)):
+        data['Age'] = data['Age'].apply(clean_age)
+
+    # Apply gender standardization
+    with metrics.stage('clean.gender', len(data)):
+        data['Gender'] = data['Gender'].apply(standardize_gender)
+
+    # Apply location and state extraction
+    with metrics.stage('clean.location', len(data)):
+        data['State'] = None
+        data[['Location', 'State']] = data.apply(lambda row: pd.Series(extract_state(row['Location'])), axis=1)
+
+    # Apply date cleaning
+    with metrics.stage('clean.date', len(data)):
+        data['PurchaseDate'] = data['PurchaseDate'].apply(clean_date)
+
+        # Extract purchase month abbreviation
+        data['PurchaseMonth'] = data['PurchaseDate'].apply(lambda x: x.strftime('%b') if x is not None else None)
+
+    # Clean ProductCategory: strip and title case
+    data['ProductCategory'] = data['ProductCategory'].str.strip().str.title()
+
+    # Apply amount cleaning
+    with metrics.stage('clean.amount', len(data)):
+        data['AmountSpent'] = data['AmountSpent'].apply(clean_amount)
+
+    # Add age group column
+    with metrics.stage('clean.age_group', len(data)):
+        data['AgeGroup'] = data['Age'].apply(get_age_group)
+
+    return data
+
+def _is_missing(values):
+    """
+    Flag values the row-wise cleaners treat as missing (NaN/None or empty string)
+
+    Args:
+    values (pandas.Series): Raw column values
+
+    Returns:
+    pandas.Series: Boolean mask of missing values
+    """
+    return values.isna() | (values == '')
+
+def _broadcast_distinct(codes, distinct, func, index):
+    """
+    Resolve each distinct value once and broadcast the results to every row
+
+    Args:
+    codes (numpy.ndarray): Position of each row's value in distinct, -1 where missing
+    distinct (sequence): Distinct values, from pd.factorize or dictionary encoding
+    func (callable): Resolves one distinct value, None when distinct already holds the results
+    index (pandas.Index): Index of the source frame
+
+    Returns:
+    pandas.Series: Resolved value of every row, None where missing
+    """
+    # One slot per distinct value plus a trailing None, which code -1 picks
+    resolved = np.empty(len(distinct) + 1, dtype=object)
+    for position, value in enumerate(distinct):
+        resolved[position] = value if func is None else func(value)
+    return pd.Series(resolved[codes], index=index)
+
+def _clean_age_column(ages):
+    """
+    Vectorized equivalent of clean_age: keep the digits of each value as an integer
+
+    Args:
+    ages (pandas.Series): Raw Age values
+
+    Returns:
+    pandas.Series: Numeric ages, NaN where no digits are present
+    """
+    text = ages.astype(str).where(~_is_missing(ages))
+    digits = text.str.replace(r'[^0-9]', '', regex=True)
+    return pd.to_numeric(digits.where(digits != ''), errors='coerce')
+
+def _standardize_gender_column(genders):
+    """
+    Vectorized equivalent of standardize_gender using a lookup map
+
+    Args:
+    genders (pandas.Series): Raw Gender values
+
+    Returns:
+    pandas.Series: 'Male', 'Female' or missing
+    """
+    return genders.astype(str).where(~_is_missing(genders)).str.strip().str.lower().map(GENDER_MAP)
+
+def _canonical_name_column(names):
+    """
+    Vectorized equivalent of canonical_name: repair each distinct name once
+
+    Args:
+    names (pandas.Series): Stripped, title-cased names
+
+    Returns:
+    pandas.Series: Canonical names, None where missing
+    """
+    codes, distinct = pd.factorize(names.where(~_is_missing(names)))
+    return _broadcast_distinct(codes, distinct, canonical_name, names.index)
+
+def _extract_state_columns(locations):
+    """
+    Vectorized equivalent of extract_state: resolve each distinct location once
+
+    Locations come from a small vocabulary, so the column is factorized,
+    extract_state runs on the distinct values only and the results are
+    broadcast back to every row by code.
+
+    Args:
+    locations (pandas.Series): Raw Location values
+
+    Returns:
+    tuple: (Location, State) Series
+    """
+    text = locations.astype(str).where(~_is_missing(locations))
+    codes, distinct = pd.factorize(text)
+    return _broadcast_locations(codes, distinct, locations.index)
+
+def _broadcast_locations(codes, distinct, index):
+    """
+    Resolve each distinct location once into Location and State columns
+
+    Args:
+    codes (numpy.ndarray): Position of each row's location in distinct, -1 where missing
+    distinct (sequence): Distinct raw locations
+    index (pandas.Index): Index of the source frame
+
+    Returns:
+    tuple: (Location, State) Series
+    """
+    resolved = [extract_state(value) for value in distinct]
+    return (_broadcast_distinct(codes, [value[0] for value in resolved], None, index),
+            _broadcast_distinct(codes, [value[1] for value in resolved], None, index))
+
+# Superset regexes for the strptime directives used in DATE_FORMATS, used to
+# bucket raw strings by format before handing them to pd.to_datetime
+DIRECTIVE_PATTERNS = {
+    '%Y': r'\d{4}',
+    '%y': r'\d{2}',
+    '%m': r'\d{1,2}',
+    '%d': r'\s?\d{1,2}',
+    '%B': r'[^\W\d_]+',
+}
+
+def _format_pattern(fmt):
+    """
+    Build a regex matching every string strptime could accept for a format
+
+    Args:
+    fmt (str): strptime format string
+
+    Returns:
+    str: Regex for use with Series.str.fullmatch
+    """
+    pattern = ''
+    for piece in re.split(r'(%.)', fmt):
+        if piece in DIRECTIVE_PATTERNS:
+            pattern += DIRECTIVE_PATTERNS[piece]
+        else:
+            # strptime treats whitespace in the format as "one or more spaces"
+            pattern += ''.join(r'\s+' if char.isspace() else re.escape(char) for char in piece)
+    return pattern
+
+def parse_purchase_dates(dates):
+    """
+    Parse PurchaseDate strings by format bucket, parsing each distinct value once
+
+    Distinct raw strings are classified by regex into per-format buckets, each
+    bucket is parsed with a single pd.to_datetime call, and the results are
+    broadcast back to every row. Formats are tried in DATE_FORMATS order, so a
+    value gets the same date clean_date would give it.
+
+    Args:
+    dates (pandas.Series): Raw PurchaseDate values
+
+    Returns:
+    tuple: (datetime64 Series with NaT where no format matches,
+            dict of row counts per format plus 'unparsed' and 'missing')
+    """
+    text = dates.astype(str).where(~_is_missing(dates)).str.strip()
+
+    # Memoize on distinct values: generated dates repeat heavily
+    parsed, hits = _parse_distinct_dates(text.value_counts())
+    hits['missing'] = int(text.isna().sum())
+
+    return text.map(parsed), hits
+
+def _parse_distinct_dates(counts):
+    """
+    Parse distinct stripped PurchaseDate strings by format bucket
+
+    Args:
+    counts (pandas.Series): Row count of each distinct string, indexed by the string
+
+    Returns:
+    tuple: (datetime64 Series indexed by the distinct strings,
+            dict of row counts per format plus 'unparsed')
+    """
+    distinct = pd.Series(counts.index, index=counts.index)
+    parsed = pd.Series(pd.NaT, index=counts.index, dtype='datetime64[ns]')
+
+    hits = {}
+    for fmt in DATE_FORMATS:
+        bucket = parsed.isna() & distinct.str.fullmatch(_format_pattern(fmt), case=False)
+        if bucket.any():
+            parsed[bucket] = pd.to_datetime(distinct[bucket], format=fmt, errors='coerce')
+        hits[fmt] = int(counts[bucket & parsed.notna()].sum())
+
+    hits['unparsed'] = int(counts[parsed.isna()].sum())
+    return parsed, hits
+
+def _clean_amount_column(amounts):
+    """
+    Vectorized equivalent of clean_amount using regex replacement
+
+    Args:
+    amounts (pandas.Series): Raw AmountSpent values
+
+    Returns:
+    pandas.Series: Float amounts, NaN where no number can be read
+    """
+    text = amounts.astype(str).where(~_is_missing(amounts)).str.strip()
+
+    # Comma as decimal separator, then keep digits and the first dot only
+    cleaned = text.str.replace(',', '.', regex=False).str.replace(r'[^0-9.]', '', regex=True)
+    parts = cleaned.str.partition('.')
+    cleaned = parts[0] + parts[1] + parts[2].str.replace('.', '', regex=False)
+
+    return pd.to_numeric(cleaned.where(cleaned != ''), errors='coerce')
+
+def _age_group_column(ages):
+    """
+    Vectorized equivalent of get_age_group using pd.cut
+
+    Args:
+    ages (pandas.Series): Cleaned numeric ages
+
+    Returns:
+    pandas.Series: Age group labels, missing where age is missing
+    """
+    groups = pd.cut(ages, bins=AGE_GROUP_BINS, labels=AGE_GROUP_LABELS, right=False)
+    return groups.astype(object).where(groups.notna(), None)
+
+@metrics.timed('clean', rows=len)
+def clean_data_vectorized(data):
+    """
+    Clean and transform the input data with whole-column operations
+
+    Produces the same output as clean_data without per-row Python callbacks.
+
+    Args:
+    data (pandas.DataFrame): Raw input data to be cleaned
+
+    Returns:
+    pandas.DataFrame: Cleaned and transformed data
+    """
+    print("Cleaning and transforming data (vectorized)...")
+
+    # Convert CustomerID to numeric, coercing errors to NaN
+    data['CustomerID'] = pd.to_numeric(data['CustomerID'], errors='coerce')
+
+    # Clean Name: strip whitespace and convert to title case
+    data['Name'] = data['Name'].str.strip().str.title()
+
+    with metrics.stage('clean.name', len(data)):
+        data['CanonicalName'] = _canonical_name_column(data['Name'])
+    with metrics.stage('clean.age', len(data)):
+        data['Age'] = _clean_age_column(data['Age'])
+    with metrics.stage('clean.gender', len(data)):
+        data['Gender'] = _standardize_gender_column(data['Gender'])
+
+    with metrics.stage('clean.location', len(data)):
+        location, state = _extract_state_columns(data['Location'])
+        data['Location'] = location
+        data['State'] = state
+
+    # Keep PurchaseDate as date objects like clean_date, month from the parsed values
+    with metrics.stage('clean.date', len(data)):
+        purchase_dates, format_hits = parse_purchase_dates(data['PurchaseDate'])
+        metrics.add_counts('clean.date_formats', format_hits)
+        print("PurchaseDate format hits: " + ", ".join(f"{fmt}={count}" for fmt, count in format_hits.items() if count))
+        data['PurchaseDate'] = purchase_dates.dt.date.astype(object).where(purchase_dates.notna(), None)
+        data['PurchaseMonth'] = purchase_dates.dt.strftime('%b')
+
+    # Clean ProductCategory: strip and title case
+    data['ProductCategory'] = data['ProductCategory'].str.strip().str.title()
+
+    with metrics.stage('clean.amount', len(data)):
+        data['AmountSpent'] = _clean_amount_column(data['AmountSpent'])
+    with metrics.stage('clean.age_group', len(data)):
+        data['AgeGroup'] = _age_group_column(data['Age'])
+
+    return data
+
+def _arrow_text(values, empty_as_missing=True):
+    """
+    Raw column as an Arrow string array, without copying text already held in Arrow
+
+    Args:
+    values (pandas.Series): Raw column values
+    empty_as_missing (bool): Turn empty strings into nulls, as _is_missing does
+
+    Returns:
+    pyarrow.Array: String array with nulls for missing values
+    """
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = None
+    if array is None or not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        # Mixed or numeric columns take the same text as the pandas engines
+        array = pa.array(values.astype(str).where(values.notna()), from_pandas=True)
+        if pa.types.is_null(array.type):
+            array = array.cast(pa.string())
+    if isinstance(array, pa.ChunkedArray):
+        # Concatenated frames and multi-file Parquet loads hold their text in several chunks
+        array = array.combine_chunks()
+    if empty_as_missing:
+        array = pc.if_else(pc.equal(array, ''), pa.scalar(None, array.type), array)
+    return array
+
+def _arrow_series(array, index):
+    """
+    Convert an Arrow result back to a pandas column
+
+    Args:
+    array (pyarrow.Array): Cleaned values
+    index (pandas.Index): Index of the source frame
+
+    Returns:
+    pandas.Series: Column aligned with the source frame
+    """
+    series = array.to_pandas()
+    series.index = index
+    return series
+
+def _arrow_distinct(array):
+    """
+    Dictionary-encode an Arrow array for resolving each distinct value once
+
+    Args:
+    array (pyarrow.Array): Values to encode
+
+    Returns:
+    tuple: (list of distinct values, numpy array of codes with -1 for nulls)
+    """
+    encoded = pc.dictionary_encode(array)
+    codes = pc.fill_null(encoded.indices, -1).to_numpy()
+    return encoded.dictionary.to_pylist(), codes
+
+def _arrow_title_column(values):
+    """
+    Arrow equivalent of .str.strip().str.title()
+
+    Args:
+    values (pandas.Series): Raw Name or ProductCategory values
+
+    Returns:
+    pandas.Series: Stripped, title-cased values
+    """
+    text = _arrow_text(values, empty_as_missing=False)
+    return _arrow_series(pc.utf8_title(pc.utf8_trim_whitespace(text)), values.index)
+
+def _arrow_canonical_name_column(names):
+    """
+    Arrow equivalent of _canonical_name_column
+
+    Args:
+    names (pandas.Series): Stripped, title-cased names
+
+    Returns:
+    pandas.Series: Canonical names, None where missing
+    """
+    distinct, codes = _arrow_distinct(_arrow_text(names))
+    return _broadcast_distinct(codes, distinct, canonical_name, names.index)
+
+def _arrow_clean_age_column(ages):
+    """
+    Arrow equivalent of _clean_age_column
+
+    Args:
+    ages (pandas.Series): Raw Age values
+
+    Returns:
+    pandas.Series: Numeric ages, NaN where no digits are present
+    """
+    digits = pc.replace_substring_regex(_arrow_text(ages), r'[^0-9]', '')
+    digits = pc.if_else(pc.equal(digits, ''), pa.scalar(None, digits.type), digits)
+    return _arrow_series(pc.cast(digits, pa.float64()), ages.index)
+
+def _arrow_standardize_gender_column(genders):
+    """
+    Arrow equivalent of _standardize_gender_column
+
+    Args:
+    genders (pandas.Series): Raw Gender values
+
+    Returns:
+    pandas.Series: 'Male', 'Female' or missing
+    """
+    distinct, codes = _arrow_distinct(pc.utf8_lower(pc.utf8_trim_whitespace(_arrow_text(genders))))
+    return _broadcast_distinct(codes, distinct, GENDER_MAP.get, genders.index)
+
+def _arrow_extract_state_columns(locations):
+    """
+    Arrow equivalent of _extract_state_columns
+
+    Args:
+    locations (pandas.Series): Raw Location values
+
+    Returns:
+    tuple: (Location, State) Series
+    """
+    distinct, codes = _arrow_distinct(_arrow_text(locations))
+    return _broadcast_locations(codes, distinct, locations.index)
+
+def _arrow_parse_purchase_dates(dates):
+    """
+    Arrow equivalent of parse_purchase_dates
+
+    Distinct values and their row counts come from dictionary encoding; the
+    distinct strings go through the same format buckets as the pandas engine.
+
+    Args:
+    dates (pandas.Series): Raw PurchaseDate values
+
+    Returns:
+    tuple: (PurchaseDate Series of date objects, PurchaseMonth Series,
+            dict of row counts per format plus 'unparsed' and 'missing')
+    """
+    distinct, codes = _arrow_distinct(pc.utf8_trim_whitespace(_arrow_text(dates)))
+    counts = np.bincount(codes[codes >= 0], minlength=len(distinct))
+
+    parsed, hits = _parse_distinct_dates(pd.Series(counts, index=pd.Index(distinct, dtype=object)))
+    hits['missing'] = int((codes < 0).sum())
+
+    purchase_dates = parsed.dt.date.where(parsed.notna(), None)
+    months = parsed.dt.strftime('%b').where(parsed.notna(), None)
+    return (_broadcast_distinct(codes, purchase_dates, None, dates.index),
+            _broadcast_distinct(codes, months, None, dates.index), hits)
+
+def _arrow_clean_amount_column(amounts):
+    """
+    Arrow equivalent of _clean_amount_column
+
+    Args:
+    amounts (pandas.Series): Raw AmountSpent values
+
+    Returns:
+    pandas.Series: Float amounts, NaN where no number can be read
+    """
+    text = pc.utf8_trim_whitespace(_arrow_text(amounts))
+
+    # Comma as decimal separator, then keep digits and the first dot only
+    cleaned = pc.replace_substring_regex(pc.replace_substring(text, ',', '.'), r'[^0-9.]', '')
+    parts = pc.extract_regex(cleaned, r'^(?P<head>[^.]*\.?)(?P<tail>.*)$')
+    tail = pc.replace_substring(pc.struct_field(parts, 'tail'), '.', '')
+    cleaned = pc.binary_join_element_wise(pc.struct_field(parts, 'head'), tail, pa.scalar('', tail.type))
+
+    # Leftovers such as '' or '.' hold no number
+    numeric = pc.match_substring_regex(cleaned, r'^(\d+\.?\d*|\.\d+)$')
+    cleaned = pc.if_else(numeric, cleaned, pa.scalar(None, cleaned.type))
+    return _arrow_series(pc.cast(cleaned, pa.float64()), amounts.index)
+
+def _arrow_age_group_column(ages):
+    """
+    Arrow equivalent of _age_group_column
+
+    Args:
+    ages (pandas.Series): Cleaned numeric ages
+
+    Returns:
+    pandas.Series: Age group labels, missing where age is missing
+    """
+    values = pa.array(ages, from_pandas=True)
+    groups = pa.scalar(AGE_GROUP_LABELS[-1])
+    # Nest the comparisons from the top bin down, so the lowest matching bound wins
+    for bound, label in reversed(list(zip(AGE_GROUP_BINS[1:-1], AGE_GROUP_LABELS[:-1]))):
+        groups = pc.if_else(pc.less(values, bound), label, groups)
+    return _arrow_series(groups, ages.index)
+
+@metrics.timed('clean', rows=len)
+def clean_data_arrow(data):
+    """
+    Clean and transform the input data with Arrow compute kernels
+
+    String columns are handed to pyarrow.compute as Arrow arrays (pandas
+    keeps its text dtype in Arrow, so this is mostly zero-copy); lookups run
+    once per distinct value of a dictionary-encoded column. Produces the same
+    output as clean_data.
+
+    Args:
+    data (pandas.DataFrame): Raw input data to be cleaned
+
+    Returns:
+    pandas.DataFrame: Cleaned and transformed data
+    """
+    if pa is None:
+        raise ImportError("The arrow cleaning engine needs the pyarrow package")
+
+    print("Cleaning and transforming data (arrow)...")
+
+    # Convert CustomerID to numeric, coercing errors to NaN
+    data['CustomerID'] = pd.to_numeric(data['CustomerID'], errors='coerce')
+
+    # Clean Name: strip whitespace and convert to title case
+    data['Name'] = _arrow_title_column(data['Name'])
+
+    with metrics.stage('clean.name', len(data)):
+        data['CanonicalName'] = _arrow_canonical_name_column(data['Name'])
+    with metrics.stage('clean.age', len(data)):
+        data['Age'] = _arrow_clean_age_column(data['Age'])
+    with metrics.stage('clean.gender', len(data)):
+        data['Gender'] = _arrow_standardize_gender_column(data['Gender'])
+
+    with metrics.stage('clean.location', len(data)):
+        location, state = _arrow_extract_state_columns(data['Location'])
+        data['Location'] = location
+        data['State'] = state
+
+    with metrics.stage('clean.date', len(data)):
+        purchase_dates, purchase_months, format_hits = _arrow_parse_purchase_dates(data['PurchaseDate'])
+        metrics.add_counts('clean.date_formats', format_hits)
+        print("PurchaseDate format hits: " + ", ".join(f"{fmt}={count}" for fmt, count in format_hits.items() if count))
+        data['PurchaseDate'] = purchase_dates
+        data['PurchaseMonth'] = purchase_months
+
+    # Clean ProductCategory: strip and title case
+    data['ProductCategory'] = _arrow_title_column(data['ProductCategory'])
+
+    with metrics.stage('clean.amount', len(data)):
+        data['AmountSpent'] = _arrow_clean_amount_column(data['AmountSpent'])
+    with metrics.stage('clean.age_group', len(data)):
+        data['AgeGroup'] = _arrow_age_group_column(data['Age'])
+
+    return data
+
+def _name_cluster_id(name):
+    """
+    Stable duplicate-cluster id of a canonical name
+
+    Middle initials and case are ignored, so "John A. Smith" and "JOHN SMITH"
+    share a cluster. The id is a hash rather than a running number, so it is
+    the same across chunks, worker processes and runs.
+
+    Args:
+    name (str): Canonical name
+
+    Returns:
+    int: Non-negative id that fits a BIGINT
+    """
+    tokens = [token for token in name.lower().split() if len(token.rstrip('.')) > 1]
+    return int.from_bytes(hashlib.blake2b(' '.join(tokens).encode(), digest_size=7).digest(), 'big')
+
+def add_name_clusters(data):
+    """
+    Add NameClusterID, grouping rows whose canonical names are the same person
+
+    Args:
+    data (pandas.DataFrame): Cleaned data with CanonicalName
+
+    Returns:
+    pandas.DataFrame: Data with NameClusterID, missing where CanonicalName is
+    """
+    codes, distinct = pd.factorize(data['CanonicalName'])
+    data['NameClusterID'] = _broadcast_distinct(codes, distinct, _name_cluster_id, data.index)
+    return data
+
+# Cleaning engines selectable from main(), all with the same output
+CLEANING_ENGINES = {
+    'python': clean_data,
+    'vectorized': clean_data_vectorized,
+    'arrow': clean_data_arrow,
+}
+
+def _clean_partition(engine, partition):
+    """
+    Clean one partition in a worker process
+
+    Args:
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES
+    partition (pandas.DataFrame): Slice of the raw data
+
+    Returns:
+    pandas.DataFrame: Cleaned partition with the worker's stage timings and counts in attrs
+    """
+    # Pool processes are reused, so record only this partition's stages
+    metrics.METRICS.reset()
+    cleaned = CLEANING_ENGINES[engine](partition)
+    cleaned.attrs['metrics_stages'] = metrics.METRICS.stages
+    cleaned.attrs['metrics_counts'] = metrics.METRICS.counts
+    return cleaned
+
+def _collect_worker_metrics(cleaned):
+    """
+    Move the stage timings and counts a worker attached to a cleaned partition into this process
+
+    Run-level totals such as the date format hits then cover every partition.
+
+    Args:
+    cleaned (pandas.DataFrame): Partition returned by _clean_partition
+
+    Returns:
+    pandas.DataFrame: The same partition without the metrics in attrs
+    """
+    metrics.METRICS.stages.extend(cleaned.attrs.pop('metrics_stages', []))
+    for name, counts in cleaned.attrs.pop('metrics_counts', {}).items():
+        metrics.add_counts(name, counts)
+    return cleaned
+
+def _merge_partitions(partitions):
+    """
+    Reassemble cleaned partitions in CustomerID order
+
+    Args:
+    partitions (list): Cleaned DataFrames
+
+    Returns:
+    pandas.DataFrame: Combined cleaned data
+    """
+    partitions = [_collect_worker_metrics(partition) for partition in partitions]
+    return pd.concat(partitions).sort_values('CustomerID', kind='stable')
+
+@metrics.timed('clean.parallel', rows=len)
+def clean_data_parallel(data, workers=None, engine='vectorized'):
+    """
+    Clean the input data across CPU cores with a process pool
+
+    The data is split into one contiguous partition per worker, each partition
+    is cleaned in its own process and the results are reassembled in
+    CustomerID order.
+
+    Args:
+    data (pandas.DataFrame): Raw input data to be cleaned
+    workers (int): Number of worker processes, defaults to the CPU count
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES to run per partition
+
+    Returns:
+    pandas.DataFrame: Cleaned and transformed data
+    """
+    workers = workers or os.cpu_count() or 1
+    size = -(-len(data) // workers) or 1
+    partitions = [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+    print(f"Cleaning {len(data)} records in {len(partitions)} partitions across {workers} worker processes...")
 
-def load_unclean_data(server_name, database_name, table_name):
+    if len(partitions) <= 1:
+        return CLEANING_ENGINES[engine](data)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        cleaned = list(executor.map(_clean_partition, [engine] * len(partitions), partitions))
+
+    return _merge_partitions(cleaned)
+
+def clean_chunks_parallel(chunks, workers=None, engine='vectorized'):
     """
-    Load unclean data from SQL Server database
+    Clean a stream of chunks across CPU cores, yielding them in input order
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    while the loader keeps the pool busy.
 
     Args:
-    server_name (str): Name of the SQL Server instance
-    database_name (str): Name of the database
-    table_name (str): Name of the table to load data from
+    chunks (iterable): Iterable of raw DataFrames, e.g. from load_unclean_data_chunks
+    workers (int): Number of worker processes, defaults to the CPU count
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES to run per chunk
+
+    Yields:
+    pandas.DataFrame: Next cleaned chunk
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in chunks:
+            pending.append(executor.submit(_clean_partition, engine, chunk))
+            if len(pending) >= 2 * workers:
+                yield _collect_worker_metrics(pending.popleft().result())
+
+        while pending:
+            yield _collect_worker_metrics(pending.popleft().result())
+
+def run_cleaning_engine(data, engine='python', workers=None):
+    """
+    Clean data with the selected engine, in a process pool when workers is set
+
+    Args:
+    data (pandas.DataFrame): Raw input data to be cleaned
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES
+    workers (int): Number of worker processes, None to clean in this process
 
     Returns:
-    pandas.DataFrame: Loaded data or None if loading fails
+    pandas.DataFrame: Cleaned and transformed data
+    """
+    if workers:
+        return clean_data_parallel(data, workers, engine)
+    return CLEANING_ENGINES[engine](data)
+
+def check_engine_parity(data, engine='vectorized'):
+    """
+    Verify that a cleaning engine matches the reference clean_data output
+
+    Args:
+    data (pandas.DataFrame): Raw input data, left unmodified
+    engine (str): Name of the engine in CLEANING_ENGINES to compare
+
+    Returns:
+    bool: True when both engines produce the same values
     """
-    print("Loading unclean data from SQL Server...")
+    expected = clean_data(data.copy())
+    actual = CLEANING_ENGINES[engine](data.copy())
+
+    # Compare values only, engines may pick different dtypes and missing markers (None/NaN)
+    actual = actual.astype(object).where(actual.notna(), None)
+    expected = expected.astype(object).where(expected.notna(), None)
 
     try:
-        # Create a connection string for SQLAlchemy using pyodbc driver
-        # Trusted_Connection=yes means using Windows Authentication
-        conn_str = f"DRIVER={{SQL Server}};SERVER={server_name};DATABASE={database_name};Trusted_Connection=yes;"
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    except AssertionError as e:
+        print(f"Engine '{engine}' does not match clean_data: {e}")
+        return False
 
-        # URL encode the connection string to handle special characters
-        quoted_conn_str = quote_plus(conn_str)
+    print(f"Engine '{engine}' matches clean_data on {len(data)} records")
+    return True
 
-        # Create SQLAlchemy engine connection string
-        engine_str = f"mssql+pyodbc:///?odbc_connect={quoted_conn_str}"
+# Raw columns covered by the data-quality report
+DQ_COLUMNS = ['Name', 'Age', 'Gender', 'Location', 'PurchaseDate', 'ProductCategory', 'AmountSpent']
 
-        # Create database engine
-        engine = create_engine(engine_str)
+# Raw values that clean without any repair; other valid values count as coerced.
+# Columns without a pattern count as parsed when cleaning leaves them unchanged.
+DQ_CANONICAL_PATTERNS = {
+    'Age': r'\d+',
+    'Gender': r'Male|Female',
+    'Location': r'[^,/]+, [A-Z]{2}',
+    'PurchaseDate': r'\d{4}-\d{2}-\d{2}',
+    'AmountSpent': r'\d+(\.\d+)?',
+}
 
-        # Execute SQL query to select all records from the specified table
-        query = f"SELECT * FROM {table_name}"
-        data = pd.read_sql(query, engine)
+# Cleaned column that is missing when a raw value is invalid, if not the column itself
+DQ_RESULT_COLUMNS = {'Location': 'State'}
 
-        print(f"Successfully loaded {len(data)} records from {database_name}.{table_name}")
-        return data
+def _sample_values(values, mask, sample_size):
+    """
+    Join a few distinct raw values selected by a mask
 
-    except Exception as e:
-        # Handle and log any errors during data loading
-        print(f"Error loading data from SQL Server: {str(e)}")
-        return None
+    Args:
+    values (pandas.Series): Raw column values
+    mask (pandas.Series): Rows to sample from
+    sample_size (int): Maximum number of distinct values
 
-def clean_data(data):
+    Returns:
+    str: Values separated by ' | ', empty when the mask selects nothing
     """
-    Clean and transform the input data
+    return ' | '.join(values[mask].astype(str).drop_duplicates().head(sample_size))
+
+def data_quality_report(raw, cleaned, sample_size=5):
+    """
+    Count missing, invalid, coerced and parsed values per column
+
+    Every raw value falls into exactly one bucket: missing (NULL or empty),
+    invalid (a sentinel such as 'NA' or 'TBD' that cleans to nothing),
+    coerced (repaired into a valid value) or parsed (already clean).
 
     Args:
-    data (pandas.DataFrame): Raw input data to be cleaned
+    raw (pandas.DataFrame): Raw DQ_COLUMNS values, copied before cleaning
+    cleaned (pandas.DataFrame): Cleaned data for the same rows
+    sample_size (int): Distinct offending raw values to keep per column
 
     Returns:
-    pandas.DataFrame: Cleaned and transformed data
+    pandas.DataFrame: One row per column with counts and sample values
     """
-    print("Cleaning and transforming data...")
+    rows = []
+    for column in DQ_COLUMNS:
+        values = raw[column]
+        # Parallel engines return rows in CustomerID order, align on the index
+        result = cleaned[DQ_RESULT_COLUMNS.get(column, column)].reindex(values.index)
+
+        missing = _is_missing(values)
+        text = values.astype(str).where(~missing).str.strip()
+        invalid = ~missing & result.isna()
+
+        if column in DQ_CANONICAL_PATTERNS:
+            canonical = text.str.fullmatch(DQ_CANONICAL_PATTERNS[column], na=False)
+        else:
+            canonical = (values == result).fillna(False).astype(bool)
+        parsed = ~missing & ~invalid & canonical
+        coerced = ~missing & ~invalid & ~canonical
+
+        rows.append({
+            'Column': column,
+            'Rows': len(values),
+            'Missing': int(missing.sum()),
+            'InvalidSentinel': int(invalid.sum()),
+            'Coerced': int(coerced.sum()),
+            'Parsed': int(parsed.sum()),
+            'InvalidSamples': _sample_values(values, invalid, sample_size),
+            'CoercedSamples': _sample_values(values, coerced, sample_size),
+        })
+
+    return pd.DataFrame(rows)
+
+def print_data_quality_report(report, label=None):
+    """
+    Print the data-quality counts and the invalid value samples
 
-    # Convert CustomerID to numeric, coercing errors to NaN
-    data['CustomerID'] = pd.to_numeric(data['CustomerID'], errors='coerce')
+    Args:
+    report (pandas.DataFrame): Report from data_quality_report
+    label (str): Part of the run the report covers, such as a chunk number
+    """
+    print(f"Data quality report{f' ({label})' if label else ''}:")
+    print(report[['Column', 'Rows', 'Missing', 'InvalidSentinel', 'Coerced', 'Parsed']].to_string(index=False))
+    for column, samples in zip(report['Column'], report['InvalidSamples']):
+        if samples:
+            print(f"  Invalid {column} samples: {samples}")
 
-    # Clean Name: strip whitespace and convert to title case
-    data['Name'] = data['Name'].str.strip().str.title()
+def write_data_quality_report(report, backend, table_name, source_table, run_at, chunk=None):
+    """
+    Append a data-quality report to a table Tableau can chart over time
 
-    # Age cleaning function: handles various age input formats
-    def clean_age(age):
-        if pd.isna(age) or age == '':
-            return None
+    Args:
+    report (pandas.DataFrame): Report from data_quality_report
+    backend (StorageBackend): Backend holding the report table
+    table_name (str): Report table name
+    source_table (str): Table the raw data came from
+    run_at (datetime): Start of the cleaning run, shared by all its chunks
+    chunk (int): Chunk number within the run, None for a single pass
 
-        # Log invalid age values that don't contain digits
-        if not any(c.isdigit() for c in str(age)):
-            print(f"Invalid Age: {age}")
-            return None
+    Returns:
+    bool: Success status of the write
+    """
+    try:
+        # Nullable integer keeps Chunk numeric in the table even for single pass runs
+        stored = report.assign(RunAt=run_at, SourceTable=source_table,
+                               Chunk=pd.Series(chunk, index=report.index, dtype='Int32'))
+        backend.write_table(stored, table_name, 'append')
+        return True
 
-        # Extract only digits from age input
-        digit_part = ''.join(c for c in str(age) if c.isdigit())
-        if digit_part:
-            return int(digit_part)  # Convert to integer
-        return None
+    except Exception as e:
+        # A failed report write should not fail the cleaning run
+        print(f"Error writing data quality report to {backend.kind}: {str(e)}")
+        return False
 
-    # Apply age cleaning
-    data['Age'] = data['Age'].apply(clean_age)
-
-    # Gender standardization function
-    def standardize_gender(gender):
-        if pd.isna(gender) or gender == '':
-            return None
-        gender = str(gender).strip().lower()
-        if gender in ['m', 'male']:
-            return 'Male'
-        elif gender in ['f', 'female']:
-            return 'Female'
-        return None
+def _report_data_quality(raw, cleaned, backend, dq_table, source_table, run_at, chunk=None):
+    """
+    Print the data-quality report of a cleaned batch and optionally store it
 
-    # Apply gender standardization
-    data['Gender'] = data['Gender'].apply(standardize_gender)
+    Args:
+    raw (pandas.DataFrame): Raw DQ_COLUMNS values, copied before cleaning
+    cleaned (pandas.DataFrame): Cleaned data for the same rows
+    backend (StorageBackend): Backend holding the report table
+    dq_table (str): Report table name, None to only print the report
+    source_table (str): Table the raw data came from
+    run_at (datetime): Start of the cleaning run
+    chunk (int): Chunk number within the run, None for a single pass
+    """
+    report = data_quality_report(raw, cleaned)
+    print_data_quality_report(report, f"chunk {chunk}" if chunk is not None else None)
+    if dq_table:
+        write_data_quality_report(report, backend, dq_table, source_table, run_at, chunk)
 
-    # Location and State extraction function
-    def extract_state(location):
-        if pd.isna(location) or location == '':
-            return None, None
+def _with_raw_snapshots(chunks, snapshots):
+    """
+    Pass chunks through, queueing a copy of their raw DQ_COLUMNS values
 
-        location = str(location).strip()
+    The engines clean in place, so the copy is what the data-quality report
+    sees; chunks come back from cleaning in order, so a FIFO pairs them up.
 
-        # Handle city, state format (comma-separated)
-        if ',' in location:
-            parts = location.split(',')
-            city_part = parts[0].strip()
-            state_part = parts[1].strip() if len(parts) > 1 else None
+    Args:
+    chunks (iterable): Iterable of raw DataFrames
+    snapshots (collections.deque): Queue the raw copies are appended to
 
-            # Standardize state part
-            if state_part and len(state_part) > 2:
-                state_part = state_part[:2].upper()
-            elif state_part:
-                state_part = state_part.upper()
+    Yields:
+    pandas.DataFrame: The unchanged chunk
+    """
+    for chunk in chunks:
+        snapshots.append(chunk[DQ_COLUMNS].copy())
+        yield chunk
+
+# Month abbreviations in calendar order, rendered the same way PurchaseMonth is
+MONTH_ABBREVIATIONS = [datetime(2023, month, 1).strftime('%b') for month in range(1, 13)]
+
+# Output schema for cleaned data: compact pandas dtype (None keeps the text dtype)
+# and matching SQL column type
+CLEAN_SCHEMA = {
+    'CustomerID': ('Int32', Integer()),
+    'Name': (None, NVARCHAR(100)),
+    'Age': ('Int16', SmallInteger()),
+    'Gender': (CategoricalDtype(['Male', 'Female']), NVARCHAR(6)),
+    'Location': (None, NVARCHAR(100)),
+    'PurchaseDate': ('datetime64[ns]', Date()),
+    'ProductCategory': ('category', NVARCHAR(50)),
+    # float32 in memory only, storage_frame writes it as cents (see STORED_CENTS_COLUMNS)
+    'AmountSpent': ('float32', Numeric(10, 2)),
+    'State': ('category', NVARCHAR(2)),
+    'PurchaseMonth': (CategoricalDtype(MONTH_ABBREVIATIONS, ordered=True), NVARCHAR(3)),
+    'AgeGroup': (CategoricalDtype(AGE_GROUP_LABELS, ordered=True), NVARCHAR(6)),
+    'CanonicalName': (None, NVARCHAR(100)),
+    'NameClusterID': ('Int64', BigInteger()),
+}
+
+# SQL column type of every CLEAN_SCHEMA column, also used to type the Parquet extract
+CLEAN_SQL_TYPES = {column: sql_type for column, (_, sql_type) in CLEAN_SCHEMA.items()}
+
+@metrics.timed('schema', rows=len)
+def apply_clean_schema(data, report=False):
+    """
+    Convert cleaned data to the compact dtypes of CLEAN_SCHEMA
 
-            return location, state_part
+    Enumerations become categoricals, Age and CustomerID nullable integers,
+    PurchaseDate datetime64 and AmountSpent float32.
 
-        # Handle city/state format (slash-separated)
-        elif '/' in location:
-            parts = location.split('/')
-            city_part = parts[0].strip()
-            state_part = parts[1].strip() if len(parts) > 1 else None
+    Args:
+    data (pandas.DataFrame): Cleaned data, as returned by a cleaning engine
+    report (bool): Print per-column memory usage before and after conversion
 
-            # Standardize state part
-            if state_part and len(state_part) > 2:
-                state_part = state_part[:2].upper()
-            elif state_part:
-                state_part = state_part.upper()
+    Returns:
+    pandas.DataFrame: Data with compact dtypes
+    """
+    before = data.memory_usage(deep=True, index=False)
 
-            return f"{city_part}, {state_part}", state_part
+    for column, (dtype, _) in CLEAN_SCHEMA.items():
+        if column not in data or dtype is None:
+            continue
+        values = data[column]
 
-        # If no state information found
-        return location, None
+        if dtype in ('Int16', 'Int32'):
+            # Values outside the integer range cannot be stored and are treated as missing
+            bounds = np.iinfo(dtype.lower())
+            numeric = pd.to_numeric(values, errors='coerce')
+            out_of_range = numeric.notna() & ~numeric.between(bounds.min, bounds.max)
+            if out_of_range.any():
+                print(f"{column}: {out_of_range.sum()} values outside the {dtype} range set to missing")
+            values = numeric.where(~out_of_range)
+        elif dtype == 'datetime64[ns]':
+            values = pd.to_datetime(values)
 
-    # Apply location and state extraction
-    data['State'] = None
-    data[['Location', 'State']] = data.apply(lambda row: pd.Series(extract_state(row['Location'])), axis=1)
+        data[column] = values.astype(dtype)
 
-    # Date cleaning function with multiple format support
-    def clean_date(date_str):
-        if pd.isna(date_str) or date_str == '':
-            return None
+    if report:
+        print_memory_report(before, data.memory_usage(deep=True, index=False))
 
-        date_str = str(date_str).strip()
+    return data
 
-        # List of possible date formats to try
-        date_formats = [
-            '%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y', '%Y.%m.%d',
-            '%B %d, %Y', '%m-%d-%y', '%d/%m/%Y', '%m/%d/%y'
-        ]
+# Money columns kept as float32 in memory; float32 cannot hold most cents exactly
+# (146.68 becomes 146.67999267578125), so they are widened and rounded before writing
+STORED_CENTS_COLUMNS = ['AmountSpent']
 
-        # Try parsing date with different formats
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
+def storage_frame(data):
+    """
+    Cleaned data with the values every table and extract stores
 
-        return None
+    Args:
+    data (pandas.DataFrame): Cleaned data, after apply_clean_schema
 
-    # Apply date cleaning
-    data['PurchaseDate'] = data['PurchaseDate'].apply(clean_date)
+    Returns:
+    pandas.DataFrame: Data with STORED_CENTS_COLUMNS as float64 rounded to cents
+    """
+    cents = {column: data[column].astype('float64').round(2) for column in STORED_CENTS_COLUMNS if column in data}
+    return data.assign(**cents)
 
-    # Extract purchase month abbreviation
-    data['PurchaseMonth'] = data['PurchaseDate'].apply(lambda x: x.strftime('%b') if x is not None else None)
+def print_memory_report(before, after):
+    """
+    Print per-column memory usage before and after a dtype conversion
 
-    # Clean ProductCategory: strip and title case
-    data['ProductCategory'] = data['ProductCategory'].str.strip().str.title()
+    Args:
+    before (pandas.Series): Bytes per column before conversion
+    after (pandas.Series): Bytes per column after conversion
+    """
+    report = pd.DataFrame({'Before (MB)': before / 2**20, 'After (MB)': after / 2**20})
+    report.loc['Total'] = report.sum()
+    print("Memory usage of cleaned data:")
+    print(report.round(2).to_string())
+
+def sql_column_types(data):
+    """
+    SQL column types of CLEAN_SCHEMA for the columns present in the data
+
+    Args:
+    data (pandas.DataFrame): Cleaned data to write
+
+    Returns:
+    dict: Column name to SQLAlchemy type, for DataFrame.to_sql(dtype=...)
+    """
+    return {column: CLEAN_SQL_TYPES[column] for column in data.columns if column in CLEAN_SQL_TYPES}
+
+def staging_table_name(table_name):
+    """
+    Name of the staging table a fast write loads before swapping it in
 
-    # Amount spent cleaning function
-    def clean_amount(amount):
-        if pd.isna(amount) or amount == '':
-            return None
+    Args:
+    table_name (str): Target table name
 
-        amount_str = str(amount).strip()
+    Returns:
+    str: Staging table name
+    """
+    return f"{table_name}_Staging"
 
-        # Log invalid amount values
-        if not any(c.isdigit() for c in amount_str):
-            print(f"Invalid Amount: {amount}")
-            return None
+def clean_table_definition(table_name, data, metadata=None):
+    """
+    Explicit DDL for a cleaned data table, typed from CLEAN_SCHEMA
 
-        # Remove currency symbols
-        amount_str = amount_str.replace('$', '').replace('€', '').replace('£', '')
+    Args:
+    table_name (str): Table name
+    data (pandas.DataFrame): Cleaned data, used for the column list and order
+    metadata (sqlalchemy.MetaData): Metadata to attach the table to
 
-        # Replace comma with dot for decimal
-        amount_str = amount_str.replace(',', '.')
+    Returns:
+    sqlalchemy.Table: Table definition
+    """
+    columns = [Column(column, CLEAN_SCHEMA[column][1] if column in CLEAN_SCHEMA else NVARCHAR(255))
+               for column in data.columns]
+    return Table(table_name, metadata or MetaData(), *columns)
 
-        # Extract valid numeric characters
-        cleaned = ''
-        decimal_count = 0
+def create_staging_table(engine, table_name, data):
+    """
+    Drop any leftover staging table and create an empty one with explicit DDL
 
-        for char in amount_str:
-            if char.isdigit():
-                cleaned += char
-            elif char == '.' and decimal_count == 0:
-                cleaned += '.'
-                decimal_count += 1
+    Args:
+    engine (sqlalchemy.engine.Engine): Database engine
+    table_name (str): Target table name the staging table stands in for
+    data (pandas.DataFrame): Cleaned data, used for the column list
 
-        try:
-            return float(cleaned) if cleaned else None
-        except ValueError:
-            return None
+    Returns:
+    str: Staging table name
+    """
+    staging = clean_table_definition(staging_table_name(table_name), data)
+    staging.drop(engine, checkfirst=True)
+    staging.create(engine)
+    return staging.name
 
-    # Apply amount cleaning
-    data['AmountSpent'] = data['AmountSpent'].apply(clean_amount)
-
-    # Age group categorization function
-    def get_age_group(age):
-        if pd.isna(age):
-            return None
-        elif age < 18:
-            return 'Youth'
-        elif age < 35:
-            return 'Young'
-        elif age < 50:
-            return 'Middle'
-        else:
-            return 'Senior'
+def _rename_table(conn, old_name, new_name):
+    """
+    Rename a table inside the caller's transaction
 
-    # Add age group column
-    data['AgeGroup'] = data['Age'].apply(get_age_group)
+    Args:
+    conn (sqlalchemy.engine.Connection): Connection inside a transaction
+    old_name (str): Current table name
+    new_name (str): New table name
+    """
+    if conn.dialect.name == 'mssql':
+        conn.execute(text("EXEC sp_rename :old_name, :new_name"), {'old_name': old_name, 'new_name': new_name})
+    else:
+        conn.execute(text(f'ALTER TABLE "{old_name}" RENAME TO "{new_name}"'))
 
-    return data
+def swap_in_staging_table(engine, table_name):
+    """
+    Atomically replace the target table with its loaded staging table
+
+    The old table is renamed aside, the staging table renamed into place and
+    the old table dropped in one transaction, so readers see either the old
+    or the new contents and never an empty table.
+
+    Args:
+    engine (sqlalchemy.engine.Engine): Database engine
+    table_name (str): Target table name
+    """
+    retired_table = f"{table_name}_Retired"
+
+    with engine.begin() as conn:
+        if inspect(conn).has_table(retired_table):
+            conn.execute(text(f"DROP TABLE {retired_table}"))
+        if inspect(conn).has_table(table_name):
+            _rename_table(conn, table_name, retired_table)
+        _rename_table(conn, staging_table_name(table_name), table_name)
+        if inspect(conn).has_table(retired_table):
+            conn.execute(text(f"DROP TABLE {retired_table}"))
+
+# SQL Server rejects statements with more than this many bound parameters
+SQLSERVER_MAX_PARAMETERS = 2100
+
+def multi_insert_chunksize(column_count, chunksize, dialect_name):
+    """
+    Rows per to_sql batch for multi-row VALUES inserts
+
+    A multi-row insert binds one parameter per value, so on SQL Server rows
+    times columns must stay under SQLSERVER_MAX_PARAMETERS. Without a
+    chunksize pandas would send the whole frame as one statement.
+
+    Args:
+    column_count (int): Number of columns written
+    chunksize (int): Requested rows per batch, None for no limit
+    dialect_name (str): SQLAlchemy dialect of the target database
 
-def write_clean_data_to_sql(data, server_name, database_name, table_name):
+    Returns:
+    int: Rows per batch, the request clamped to the limit on SQL Server
+    """
+    if dialect_name != 'mssql':
+        return chunksize
+    limit = SQLSERVER_MAX_PARAMETERS // column_count - 1
+    return min(chunksize or limit, limit)
+
+def write_clean_data_to_sql(data, server_name, database_name, table_name, if_exists='replace', fast=False,
+                            chunksize=None, method=None, backend=None):
     """
     Write cleaned data to SQL Server
 
+    The fast path uses pyodbc fast_executemany, tunable to_sql batching and,
+    when replacing a SQL table, loads a staging table created with explicit
+    DDL that is swapped in atomically once fully written.
+
     Args:
     data (pandas.DataFrame): Cleaned data to write
     server_name (str): SQL Server instance name
     database_name (str): Target database name
     table_name (str): Target table name
+    if_exists (str): 'replace' to drop and recreate the table, 'append' to add rows
+    fast (bool): Use the high-throughput write path
+    chunksize (int): Rows per to_sql batch, None to send all rows at once
+    method (str): to_sql insertion method, None for executemany or 'multi' for multi-row VALUES
+    backend (StorageBackend): Write to this backend instead of SQL Server
 
     Returns:
     bool: Success status of data writing
     """
-    print(f"Writing cleaned data to SQL Server: {server_name}, Database: {database_name}, Table: {table_name}")
+    backend = resolve_backend(server_name, database_name, backend)
+    print(f"Writing cleaned data to {backend.kind}: {backend}, Table: {table_name}")
+
+    try:
+        with metrics.stage('write', len(data)):
+            data = storage_frame(data)
+            if method == 'multi' and isinstance(backend, SQLAlchemyBackend):
+                chunksize = multi_insert_chunksize(len(data.columns), chunksize, backend.dialect_name)
+            if fast and if_exists == 'replace' and isinstance(backend, SQLAlchemyBackend):
+                # Load a staging table, then swap it in so readers never see an empty table
+                engine = backend.create_engine(fast_executemany=True)
+                staging_table = create_staging_table(engine, table_name, data)
+                data.to_sql(staging_table, engine, if_exists='append', index=False, dtype=sql_column_types(data),
+                            chunksize=chunksize, method=method)
+                swap_in_staging_table(engine, table_name)
+            else:
+                # if_exists='replace' means drop and recreate the table
+                backend.write_table(data, table_name, if_exists, dtype=sql_column_types(data), chunksize=chunksize,
+                                    method=method, fast_executemany=fast)
+
+        print(f"Successfully wrote {len(data)} records to {backend.qualified_name(table_name)}")
+        return True
+
+    except Exception as e:
+        # Handle and log any errors during data writing
+        print(f"Error writing to {backend.kind}: {str(e)}")
+        return False
+
+def export_table(backend, table_name, extracts):
+    """
+    Stream a stored cleaned table into extract writers and close them
+
+    Extracts are full snapshots, so runs that only wrote part of the table
+    (incremental or resumed) export it back out in row-group sized batches.
+
+    Args:
+    backend (StorageBackend): Backend holding the cleaned table
+    table_name (str): Cleaned table name
+    extracts (list): Extract writers from open_extract_writers
+
+    Returns:
+    bool: Success status of the export
+    """
+    for batch in backend.read_table(table_name, chunksize=DEFAULT_ROW_GROUP_SIZE):
+        write_extracts(extracts, storage_frame(apply_clean_schema(batch)))
+    return close_extract_writers(extracts)
+
+def _parity_checked(chunks, engine):
+    """
+    Pass chunks through, stopping the run at the first one failing the parity check
+
+    Args:
+    chunks (iterable): Iterable of raw DataFrames
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES
+
+    Yields:
+    pandas.DataFrame: Next verified chunk
+    """
+    for chunk in chunks:
+        if not check_engine_parity(chunk, engine):
+            raise ValueError(f"Cleaning engine '{engine}' failed the parity check")
+        yield chunk
+
+def clean_in_chunks(server_name, database_name, source_table, target_table, chunksize, engine='python',
+                    check_parity=False, workers=None, fast_write=False, backend=None, dq_table=None,
+                    name_clusters=False, spend_cube=False, extracts=None, pipeline_depth=None, resume=False,
+                    write_chunksize=None, write_method=None):
+    """
+    Load, clean and write the data one chunk at a time
+
+    The first chunk replaces the target table and later chunks are appended,
+    so peak memory scales with the chunk size rather than the table size.
+    With pipeline_depth, loading and cleaning run in their own threads while
+    this thread writes, so a run takes about as long as its slowest stage.
+    With resume, chunks are read in CustomerID order and each written chunk
+    is checkpointed, so a failed run continues after its last finished chunk.
+
+    Args:
+    server_name (str): SQL Server instance name
+    database_name (str): Database holding both tables
+    source_table (str): Table with raw data
+    target_table (str): Table for cleaned data
+    chunksize (int): Number of rows per chunk
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES
+    check_parity (bool): Verify each chunk against clean_data before writing it
+    workers (int): Number of worker processes, None to clean in this process
+    fast_write (bool): Append chunks to a staging table with fast_executemany and swap it in at the end
+    backend (StorageBackend): Read and write through this backend instead of SQL Server
+    dq_table (str): Append each chunk's data-quality report to this table
+    name_clusters (bool): Add the NameClusterID duplicate-cluster column
+    spend_cube (bool): Rebuild the spend summary tables once all chunks are written
+    extracts (list): Extract writers from open_extract_writers, fed chunk by chunk and closed at the end
+    pipeline_depth (int): Chunks each stage may run ahead of the next, None to run the stages in turn
+    resume (bool): Checkpoint every chunk and continue after the chunks a failed run completed
+    write_chunksize (int): Rows per to_sql batch when writing each chunk, None to send the chunk at once
+    write_method (str): to_sql insertion method, None for executemany or 'multi' for multi-row VALUES
+
+    Returns:
+    bool: Success status of the whole run
+    """
+    backend = resolve_backend(server_name, database_name, backend)
+    extracts = extracts or []
+    if resume and not isinstance(backend, SQLAlchemyBackend):
+        # Checkpoints and the ordered, filtered reload need a SQL database
+        print(f"Resumable cleaning is not supported on the {backend.kind} backend")
+        close_extract_writers(extracts, success=False)
+        return False
+    # Staging tables and the rename swap need a SQL database
+    fast_write = fast_write and isinstance(backend, SQLAlchemyBackend)
+    job = f"clean {source_table} -> {target_table}"
+    resume_after = 0
+    run_at = datetime.now()
+    raw_chunks = deque()
+    cube_parts = []
+    stages = []
+    total = 0
 
     try:
-        # Create connection string similar to load_unclean_data
-        conn_str = f"DRIVER={{SQL Server}};SERVER={server_name};DATABASE={database_name};Trusted_Connection=yes;"
-        quoted_conn_str = quote_plus(conn_str)
-        engine_str = f"mssql+pyodbc:///?odbc_connect={quoted_conn_str}"
+        write_table = staging_table_name(target_table) if fast_write else target_table
+        if resume:
+            resume_after = prepare_resume(backend, job, write_table)
+
+        chunks = load_unclean_data_chunks(server_name, database_name, source_table, chunksize, backend=backend,
+                                          after=resume_after if resume else None)
+        if pipeline_depth:
+            chunks = prefetch(chunks, pipeline_depth, 'load')
+            stages.append(chunks)
+        if check_parity:
+            chunks = _parity_checked(chunks, engine)
+        chunks = _with_raw_snapshots(chunks, raw_chunks)
+
+        if workers:
+            # Clean whole chunks in worker processes while the loader reads ahead
+            cleaned_chunks = clean_chunks_parallel(chunks, workers, engine)
+        else:
+            cleaned_chunks = (CLEANING_ENGINES[engine](chunk) for chunk in chunks)
+        if pipeline_depth:
+            # Clean the next chunks while this thread writes the current one
+            cleaned_chunks = prefetch(cleaned_chunks, pipeline_depth, 'clean')
+            stages.insert(0, cleaned_chunks)
+
+        # A resumed run appends to what the failed run already wrote
+        starts_table = not resume_after
+        # Extracts and the cube of a resumed run also need the earlier rows, they are built from the table at the end
+        stream_outputs = not resume_after
+
+        for number, cleaned in enumerate(cleaned_chunks):
+            _report_data_quality(raw_chunks.popleft(), cleaned, backend, dq_table, source_table, run_at, number + 1)
+            if name_clusters:
+                cleaned = add_name_clusters(cleaned)
+            cleaned = apply_clean_schema(cleaned)
+            if fast_write and number == 0 and starts_table:
+                create_staging_table(backend.create_engine(), target_table, cleaned)
+            if_exists = 'replace' if number == 0 and starts_table and not fast_write else 'append'
+            if not write_clean_data_to_sql(cleaned, server_name, database_name, write_table, if_exists, fast_write,
+                                           write_chunksize, write_method, backend=backend):
+                close_extract_writers(extracts, success=False)
+                return False
+            if resume:
+                with backend.create_engine().begin() as conn:
+                    record_checkpoint(conn, job, int(cleaned['CustomerID'].min()), int(cleaned['CustomerID'].max()),
+                                      len(cleaned))
+            if extracts and stream_outputs:
+                write_extracts(extracts, storage_frame(cleaned))
+            if spend_cube and stream_outputs:
+                # Only the compact dimension and amount columns are kept for the cube
+                cube_parts.append(cube_frame(cleaned))
+            total += len(cleaned)
+            print(f"Processed {total} records...")
+
+        if fast_write and (total or (resume_after and backend.has_table(write_table))):
+            swap_in_staging_table(backend.create_engine(), target_table)
+
+        if stream_outputs:
+            if not close_extract_writers(extracts):
+                return False
+            if spend_cube and cube_parts and not write_spend_cube(combine_cube_frames(cube_parts), backend,
+                                                                 target_table):
+                return False
+        else:
+            if extracts and not export_table(backend, target_table, extracts):
+                return False
+            if spend_cube and not write_spend_cube(apply_clean_schema(backend.read_table(target_table)), backend,
+                                                   target_table):
+                return False
+
+        if resume:
+            # The run is complete, the next resumable run starts a fresh table
+            clear_checkpoints(backend.create_engine(), job)
+
+    except Exception as e:
+        # Handle and log any errors during chunked loading and cleaning
+        print(f"Error during chunked cleaning: {str(e)}")
+        close_extract_writers(extracts, success=False)
+        return False
+
+    finally:
+        # Stop pipeline stages an error left running, the one nearest the writer first
+        for stage in stages:
+            stage.close()
+
+    print(f"Successfully cleaned {total} records from {backend.qualified_name(source_table)}")
+    return True
+
+# State table recording the highest CustomerID already cleaned per source table
+watermark_metadata = MetaData()
+watermark_table = Table(
+    'CleaningWatermarks', watermark_metadata,
+    Column('SourceTable', String(128), primary_key=True),
+    Column('LastCustomerID', Integer, nullable=False),
+    Column('UpdatedAt', DateTime, nullable=False),
+)
+
+def get_watermark(engine, source_table):
+    """
+    Read the high-water mark for a source table, creating the state table if needed
+
+    Args:
+    engine (sqlalchemy.engine.Engine): Database engine
+    source_table (str): Source table name
+
+    Returns:
+    int: Highest CustomerID already cleaned, 0 if the table was never cleaned
+    """
+    watermark_metadata.create_all(engine, checkfirst=True)
+
+    with engine.connect() as conn:
+        query = select(watermark_table.c.LastCustomerID).where(watermark_table.c.SourceTable == source_table)
+        watermark = conn.execute(query).scalar()
+
+    return watermark or 0
+
+def set_watermark(conn, source_table, last_customer_id):
+    """
+    Store the high-water mark for a source table
+
+    Args:
+    conn (sqlalchemy.engine.Connection): Connection inside the upsert transaction
+    source_table (str): Source table name
+    last_customer_id (int): Highest CustomerID now cleaned
+    """
+    values = {'LastCustomerID': last_customer_id, 'UpdatedAt': datetime.now()}
+    updated = conn.execute(
+        watermark_table.update().where(watermark_table.c.SourceTable == source_table).values(**values)
+    )
+    if updated.rowcount == 0:
+        conn.execute(watermark_table.insert().values(SourceTable=source_table, **values))
+
+def load_unclean_delta(engine, table_name, watermark):
+    """
+    Load only the rows added to the source table since the last run
+
+    Args:
+    engine (sqlalchemy.engine.Engine): Database engine
+    table_name (str): Source table name
+    watermark (int): Highest CustomerID already cleaned
 
-        # Create database engine
-        engine = create_engine(engine_str)
+    Returns:
+    pandas.DataFrame: Rows with CustomerID above the watermark
+    """
+    query = text(f"SELECT * FROM {table_name} WHERE CustomerID > :watermark ORDER BY CustomerID")
+    return pd.read_sql(query, engine, params={'watermark': watermark})
+
+def upsert_clean_data(data, conn, table_name, chunksize=None, method=None):
+    """
+    Merge cleaned rows into the target table keyed on CustomerID
+
+    Rows are staged in a scratch table, matching CustomerIDs are deleted from
+    the target and the staged rows inserted, all on the caller's transaction.
+
+    Args:
+    data (pandas.DataFrame): Cleaned rows to merge
+    conn (sqlalchemy.engine.Connection): Connection inside a transaction
+    table_name (str): Target table name
+    chunksize (int): Rows per to_sql batch, None to send all rows at once
+    method (str): to_sql insertion method, None for executemany or 'multi' for multi-row VALUES
+    """
+    data = storage_frame(data)
+    if method == 'multi':
+        chunksize = multi_insert_chunksize(len(data.columns), chunksize, conn.dialect.name)
+    if not inspect(conn).has_table(table_name):
+        data.to_sql(table_name, conn, index=False, dtype=sql_column_types(data), chunksize=chunksize, method=method)
+        return
+
+    staging_table = f"{table_name}_Delta"
+    data.to_sql(staging_table, conn, if_exists='replace', index=False, dtype=sql_column_types(data),
+                chunksize=chunksize, method=method)
+
+    columns = ', '.join(f'"{column}"' for column in data.columns)
+    conn.execute(text(f"DELETE FROM {table_name} WHERE CustomerID IN (SELECT CustomerID FROM {staging_table})"))
+    conn.execute(text(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table}"))
+    conn.execute(text(f"DROP TABLE {staging_table}"))
+
+def clean_incremental(server_name, database_name, source_table, target_table, engine='python', workers=None,
+                      backend=None, dq_table=None, name_clusters=False,
+                      spend_cube=False, extracts=None, write_chunksize=None, write_method=None, check_parity=False):
+    """
+    Clean only the rows added since the last run and merge them into the target
+
+    The watermark and the merged rows are committed in one transaction, so
+    a failed run leaves both untouched and is simply retried next time.
+
+    Args:
+    server_name (str): SQL Server instance name
+    database_name (str): Database holding both tables
+    source_table (str): Table with raw data
+    target_table (str): Table for cleaned data
+    engine (str): Name of the cleaning engine in CLEANING_ENGINES
+    workers (int): Number of worker processes, None to clean in this process
+    backend (StorageBackend): Read and write through this backend instead of SQL Server
+    dq_table (str): Append the delta's data-quality report to this table
+    name_clusters (bool): Add the NameClusterID duplicate-cluster column
+    spend_cube (bool): Fold the new rows into the spend summary tables
+    extracts (list): Extract writers from open_extract_writers, rewritten from the whole merged table
+    write_chunksize (int): Rows per to_sql batch when merging, None to send the delta at once
+    write_method (str): to_sql insertion method, None for executemany or 'multi' for multi-row VALUES
+    check_parity (bool): Verify the delta against clean_data before merging it
 
-        # Write data to SQL Server
-        # if_exists='replace' means drop and recreate the table
-        data.to_sql(table_name, engine, if_exists='replace', index=False)
+    Returns:
+    bool: Success status of the run
+    """
+    backend = resolve_backend(server_name, database_name, backend)
+    if not isinstance(backend, SQLAlchemyBackend):
+        # The watermark table and transactional merge need a SQL database
+        print(f"Incremental cleaning is not supported on the {backend.kind} backend")
+        close_extract_writers(extracts or [], success=False)
+        return False
 
-        print(f"Successfully wrote {len(data)} records to {database_name}.{table_name}")
+    try:
+        sql_engine = backend.create_engine()
+
+        watermark = get_watermark(sql_engine, source_table)
+        delta = load_unclean_delta(sql_engine, source_table, watermark)
+        print(f"Loaded {len(delta)} new records above CustomerID {watermark} from {backend.qualified_name(source_table)}")
+
+        if delta.empty:
+            print("No new records to clean.")
+            # Nothing changed, keep the existing extracts
+            close_extract_writers(extracts or [], success=False)
+            return True
+
+        if check_parity and not check_engine_parity(delta, engine):
+            print("Cleaning engine parity check failed, nothing merged.")
+            close_extract_writers(extracts or [], success=False)
+            return False
+
+        raw = delta[DQ_COLUMNS].copy()
+        cleaned = run_cleaning_engine(delta, engine, workers)
+        _report_data_quality(raw, cleaned, backend, dq_table, source_table, datetime.now())
+        if name_clusters:
+            cleaned = add_name_clusters(cleaned)
+        cleaned = apply_clean_schema(cleaned)
+
+        with sql_engine.begin() as conn:
+            upsert_clean_data(cleaned, conn, target_table, write_chunksize, write_method)
+            set_watermark(conn, source_table, int(cleaned['CustomerID'].max()))
+
+        print(f"Successfully merged {len(cleaned)} records into {backend.qualified_name(target_table)}")
+
+        if extracts and not export_table(backend, target_table, extracts):
+            return False
+
+        if spend_cube:
+            if backend.has_table(cube_table_name(target_table, 'SpendCube')):
+                return write_spend_cube(cleaned, backend, target_table, incremental=True)
+            # No summary tables yet, build them from everything cleaned so far
+            return write_spend_cube(apply_clean_schema(backend.read_table(target_table)), backend, target_table)
         return True
 
     except Exception as e:
-        # Handle and log any errors during data writing
-        print(f"Error writing to SQL Server: {str(e)}")
+        # Handle and log any errors during the incremental run
+        print(f"Error during incremental cleaning: {str(e)}")
+        close_extract_writers(extracts or [], success=False)
         return False
 
-def main():
+def report_status(success, backend, clean_table):
     """
-    Main function to orchestrate data cleaning process
+    Print the final status of a cleaning run
+
+    Args:
+    success (bool): Whether the run completed without errors
+    backend (StorageBackend): Backend the cleaned data was written to
+    clean_table (str): Table holding the cleaned data
+    """
+    if success:
+        print("\nProcess completed successfully!")
+        print(f"Cleaned data has been imported into {backend} in the {clean_table} table.")
+    else:
+        print("\nProcess completed with errors.")
+        print(f"Check the error messages above and verify your {backend.kind} connection details.")
+
+def parse_args(argv=None):
+    """
+    Parse command line options for the cleaning process
+
+    Args:
+    argv (list): Arguments to parse, defaults to sys.argv
+
+    Returns:
+    argparse.Namespace: Parsed options
+    """
+    parser = argparse.ArgumentParser(description="Clean UncleanCustomers and write CleanedCustomers")
+    parser.add_argument("--engine", choices=sorted(CLEANING_ENGINES), default="python",
+                        help="Cleaning engine to run")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="Verify the selected engine against clean_data before writing")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Stream the source table in chunks of this many rows to bound memory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Clean in this many worker processes (0 for one per CPU core)")
+    parser.add_argument("--fast-write", action="store_true",
+                        help="Write with fast_executemany into a staging table that is swapped in atomically")
+    parser.add_argument("--write-chunksize", type=int, default=None,
+                        help="Rows per to_sql batch when writing the cleaned table")
+    parser.add_argument("--write-method", choices=["multi"], default=None,
+                        help="Use multi-row VALUES inserts (batches are capped to SQL Server's 2100-parameter limit)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap loading, cleaning and writing of chunks in concurrent stages (needs --chunk-size)")
+    parser.add_argument("--pipeline-depth", type=int, default=DEFAULT_DEPTH,
+                        help="Chunks each pipeline stage may run ahead of the next, bounds memory")
+    parser.add_argument("--resume", action="store_true",
+                        help="Checkpoint every chunk and continue after the last one a failed run completed "
+                             "(needs --chunk-size and a SQL database)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Clean only rows above the stored CustomerID watermark and merge them (not chunked)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="sqlserver",
+                        help="Storage to read the raw table from and write the cleaned table to")
+    parser.add_argument("--path", default=None,
+                        help="Database file or Parquet directory for the sqlite, duckdb and parquet backends")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Connections kept open in the shared pool per database")
+    parser.add_argument("--no-pool-pre-ping", action="store_true",
+                        help="Skip the liveness check on pooled connections before reuse")
+    parser.add_argument("--name-clusters", action="store_true",
+                        help="Add NameClusterID grouping rows whose canonical names match")
+    parser.add_argument("--spend-cube", action="store_true",
+                        help="Write pre-aggregated spend summary tables next to the cleaned table")
+    parser.add_argument("--export-parquet", default=None,
+                        help="Also write the cleaned data to this directory as Parquet partitioned by PurchaseMonth/State")
+    parser.add_argument("--export-hyper", default=None,
+                        help="Also write the cleaned data to this Tableau Hyper extract (needs tableauhyperapi)")
+    parser.add_argument("--export-row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Rows per row group of the Parquet extract")
+    parser.add_argument("--dq-table", default=None,
+                        help="Append the data-quality report of the run to this table for Tableau")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Append per-stage timings, memory and DB round-trips of the run to this JSON lines file")
+    parser.add_argument("--profile", default=None,
+                        help="Profile the run with cProfile and write the stats to this file")
+    args = parser.parse_args(argv)
+
+    # The incremental merge cleans the delta and commits it with the watermark in one pass
+    if args.incremental:
+        chunked = [flag for flag, value in [('--chunk-size', args.chunk_size), ('--pipeline', args.pipeline),
+                                            ('--resume', args.resume)] if value]
+        if chunked:
+            parser.error(f"--incremental merges the whole delta in one transaction and cannot be combined with "
+                         f"{', '.join(chunked)}")
+    return args
+
+def run_cleaning(args):
+    """
+    Run the data cleaning process for parsed command line options
+
+    Args:
+    args (argparse.Namespace): Options from parse_args
     """
     # Configuration parameters
     server = r"LAPTOP-D00LK2I0\SQLEXPRESS01"  # SQL Server instance
     database = "Customer Analysis"  # Database name
     unclean_table = "UncleanCustomers"  # Source table with raw data
     clean_table = "CleanedCustomers"  # Destination table for cleaned data
+    configure_pool(args.pool_size, pre_ping=not args.no_pool_pre_ping)
+    backend = get_backend(args.backend, server, database, args.path)
+
+    # --workers 0 means one worker per CPU core, leaving it out cleans in this process
+    workers = (args.workers or os.cpu_count()) if args.workers is not None else None
+
+    # Columnar extracts for Tableau, written alongside the cleaned table
+    try:
+        extracts = open_extract_writers(args.export_parquet, args.export_hyper, args.export_row_group_size,
+                                        CLEAN_SQL_TYPES)
+    except Exception as e:
+        print(f"Error opening extract export: {str(e)}")
+        return
+
+    if args.incremental:
+        # Clean only the delta since the last run and merge it into the target
+        success = clean_incremental(server, database, unclean_table, clean_table, args.engine, workers,
+                                    backend=backend, dq_table=args.dq_table,
+                                    name_clusters=args.name_clusters, spend_cube=args.spend_cube,
+                                    extracts=extracts, write_chunksize=args.write_chunksize,
+                                    write_method=args.write_method, check_parity=args.check_parity)
+        report_status(success, backend, clean_table)
+        return
 
-    # Load unclean data from SQL Server
-    unclean_data = load_unclean_data(server, database, unclean_table)
+    if args.pipeline and not args.chunk_size:
+        print("--pipeline needs --chunk-size, running the stages in turn")
+    if args.resume and not args.chunk_size:
+        print("--resume needs --chunk-size, running without checkpoints")
+
+    if args.chunk_size:
+        # Stream load, clean and write chunk by chunk
+        success = clean_in_chunks(server, database, unclean_table, clean_table, args.chunk_size, args.engine,
+                                  args.check_parity, workers, args.fast_write, backend=backend,
+                                  dq_table=args.dq_table, name_clusters=args.name_clusters,
+                                  spend_cube=args.spend_cube, extracts=extracts,
+                                  pipeline_depth=args.pipeline_depth if args.pipeline else None,
+                                  resume=args.resume, write_chunksize=args.write_chunksize,
+                                  write_method=args.write_method)
+        report_status(success, backend, clean_table)
+        return
+
+    # Load unclean data from the selected backend
+    unclean_data = load_unclean_data(server, database, unclean_table, backend=backend)
 
     # Exit if data loading fails
     if unclean_data is None:
         print("Error loading unclean data. Exiting.")
+        close_extract_writers(extracts, success=False)
         return
 
-    # Clean the loaded data
-    cleaned_data = clean_data(unclean_data)
+    # Optionally confirm the selected engine agrees with the reference implementation
+    if args.check_parity and not check_engine_parity(unclean_data, args.engine):
+        print("Cleaning engine parity check failed. Exiting.")
+        close_extract_writers(extracts, success=False)
+        return
 
-    # Write cleaned data back to SQL Server
-    success = write_clean_data_to_sql(cleaned_data, server, database, clean_table)
+    # Clean the loaded data, keeping the raw values for the data-quality report
+    run_at = datetime.now()
+    raw_data = unclean_data[DQ_COLUMNS].copy()
+    cleaned_data = run_cleaning_engine(unclean_data, args.engine, workers)
+    _report_data_quality(raw_data, cleaned_data, backend, args.dq_table, unclean_table, run_at)
+    if args.name_clusters:
+        cleaned_data = add_name_clusters(cleaned_data)
 
-    # Print final status
-    if success:
-        print("\nProcess completed successfully!")
-        print(f"Cleaned data has been imported into {database} on {server} in the {clean_table} table.")
-    else:
-        print("\nProcess completed with errors.")
-        print("Check the error messages above and verify your SQL Server connection details.")
+    # Convert to the compact output schema and show the memory saved
+    cleaned_data = apply_clean_schema(cleaned_data, report=True)
+
+    # Write cleaned data back to the selected backend
+    success = write_clean_data_to_sql(cleaned_data, server, database, clean_table, fast=args.fast_write,
+                                      chunksize=args.write_chunksize, method=args.write_method, backend=backend)
+
+    # Pre-aggregate the dashboard's spend summaries next to the cleaned table
+    if success and args.spend_cube:
+        success = write_spend_cube(cleaned_data, backend, clean_table)
+
+    # Export the same rows to the Parquet/Hyper extracts
+    if success and extracts:
+        try:
+            write_extracts(extracts, storage_frame(cleaned_data))
+        except Exception as e:
+            print(f"Error exporting extracts: {str(e)}")
+            success = False
+    if extracts:
+        success = close_extract_writers(extracts, success)
+    report_status(success, backend, clean_table)
+
+def main(argv=None):
+    """
+    Main function to orchestrate data cleaning process
+    """
+    args = parse_args(argv)
+
+    # Optionally profile the whole run
+    with metrics.profiled(args.profile):
+        run_cleaning(args)
+
+    # Stage timings and round-trips of the run, one JSON line per run
+    if args.metrics_out:
+        metrics.print_summary()
+        metrics.write_metrics(args.metrics_out, 'clean.py', argv if argv is not None else sys.argv[1:])
 
 if __name__ == "__main__":
     main()
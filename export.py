@@ -0,0 +1,309 @@
+import os
+import shutil
+import pandas as pd
+import metrics
+from storage import arrow_schema
+
+try:
+    import tableauhyperapi as hyperapi
+except ImportError:
+    # Optional: only needed for --export-hyper
+    hyperapi = None
+
+# Columns the Parquet extract is partitioned by, outermost directory first
+PARTITION_COLUMNS = ['PurchaseMonth', 'State']
+
+# Directory name Hive-style readers (pyarrow, DuckDB, Spark) use for a missing partition value
+MISSING_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Rows per Parquet row group; partitions are flushed once they have this many rows buffered
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+# Rows buffered across all partitions before everything is flushed, bounds memory on wide partitionings
+MAX_BUFFERED_ROWS = 1_000_000
+
+def _partition_value(value):
+    """
+    Directory name component of one partition value
+
+    Args:
+        value: Partition column value, may be missing
+
+    Returns:
+        str: Value as text, or MISSING_PARTITION
+    """
+    return MISSING_PARTITION if pd.isna(value) else str(value)
+
+class ParquetExtractWriter:
+    """
+    Streams cleaned data into a Parquet dataset partitioned by purchase month and state
+
+    The dataset is laid out Hive-style (PurchaseMonth=Jan/State=CA/part-00000.parquet)
+    with one open file per partition. Rows are buffered per partition and
+    written as row groups of row_group_size, dictionary-encoded and with
+    min/max statistics, so readers can skip partitions and row groups. The
+    dataset is built next to the target directory and swapped in on close.
+    Every file shares one schema, built from column_types on the first write,
+    so a first batch with an all-null column does not pin it to the null type.
+    """
+
+    def __init__(self, directory, row_group_size=DEFAULT_ROW_GROUP_SIZE, max_buffered_rows=MAX_BUFFERED_ROWS,
+                 column_types=None):
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.max_buffered_rows = max_buffered_rows
+        self.column_types = column_types
+        self.staging_directory = f"{directory.rstrip(os.sep)}.staging"
+        self.schema = None
+        self.writers = {}
+        self.buffers = {}
+        self.buffer_rows = {}
+        self.buffered_rows = 0
+        self.rows = 0
+
+        shutil.rmtree(self.staging_directory, ignore_errors=True)
+        os.makedirs(self.staging_directory)
+
+    def __str__(self):
+        return f"Parquet extract {self.directory}"
+
+    def write(self, data):
+        """
+        Add cleaned rows to the extract
+
+        Args:
+            data (pandas.DataFrame): Cleaned data after apply_clean_schema
+        """
+        import pyarrow as pa
+
+        columns = data.drop(columns=PARTITION_COLUMNS)
+        if self.schema is None:
+            self.schema = arrow_schema(columns, self.column_types)
+        table = pa.Table.from_pandas(columns, schema=self.schema, preserve_index=False)
+
+        # Row positions of every partition in this batch, in one groupby pass
+        groups = data.groupby(PARTITION_COLUMNS, observed=True, dropna=False, sort=False).indices
+        for key, positions in groups.items():
+            key = tuple(_partition_value(value) for value in key)
+            self.buffers.setdefault(key, []).append(table.take(positions))
+            self.buffer_rows[key] = self.buffer_rows.get(key, 0) + len(positions)
+            self.buffered_rows += len(positions)
+            if self.buffer_rows[key] >= self.row_group_size:
+                self._flush(key)
+
+        if self.buffered_rows >= self.max_buffered_rows:
+            for key in list(self.buffers):
+                self._flush(key)
+        self.rows += len(data)
+
+    def _flush(self, key):
+        """
+        Write the buffered rows of one partition as row groups
+
+        Args:
+            key (tuple): Partition values, in PARTITION_COLUMNS order
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts = self.buffers.pop(key, None)
+        if not parts:
+            return
+        table = pa.concat_tables(parts)
+        self.buffered_rows -= self.buffer_rows.pop(key)
+
+        if key not in self.writers:
+            directory = os.path.join(self.staging_directory,
+                                     *(f"{column}={value}" for column, value in zip(PARTITION_COLUMNS, key)))
+            os.makedirs(directory, exist_ok=True)
+            self.writers[key] = pq.ParquetWriter(os.path.join(directory, 'part-00000.parquet'), self.schema,
+                                                 use_dictionary=True, write_statistics=True)
+        self.writers[key].write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        """
+        Flush every partition and swap the finished dataset into place
+        """
+        for key in list(self.buffers):
+            self._flush(key)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.staging_directory, self.directory)
+        print(f"Wrote {self.rows} records to {self} in {len(os.listdir(self.directory))} month partitions")
+
+    def abort(self):
+        """
+        Discard the partially written dataset, leaving the previous one in place
+        """
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+        shutil.rmtree(self.staging_directory, ignore_errors=True)
+
+def _hyper_type(dtype):
+    """
+    Hyper column type for a pandas dtype of CLEAN_SCHEMA
+
+    Args:
+        dtype: pandas dtype of the column
+
+    Returns:
+        tableauhyperapi.SqlType: Matching Hyper type
+    """
+    if pd.api.types.is_integer_dtype(dtype):
+        return {1: hyperapi.SqlType.small_int(), 2: hyperapi.SqlType.small_int(),
+                4: hyperapi.SqlType.int()}.get(dtype.itemsize, hyperapi.SqlType.big_int())
+    if pd.api.types.is_float_dtype(dtype):
+        return hyperapi.SqlType.double()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        # The only datetime column is PurchaseDate, a Date in CLEAN_SCHEMA
+        return hyperapi.SqlType.date()
+    return hyperapi.SqlType.text()
+
+class HyperExtractWriter:
+    """
+    Streams cleaned data into a Tableau Hyper extract (Extract.Extract table)
+
+    Needs the optional tableauhyperapi package. A Hyper process is started on
+    the first write and rows are streamed through one Inserter, which sends
+    them to Hyper in blocks; the extract is built next to the target file and
+    swapped in on close.
+    """
+
+    def __init__(self, path):
+        if hyperapi is None:
+            raise ImportError("Hyper export needs the tableauhyperapi package (pip install tableauhyperapi)")
+        self.path = path
+        self.staging_path = f"{path}.staging.hyper"
+        self.process = None
+        self.connection = None
+        self.inserter = None
+        self.rows = 0
+
+    def __str__(self):
+        return f"Hyper extract {self.path}"
+
+    def _open(self, data):
+        """
+        Start Hyper and create the extract table from the columns of the first batch
+
+        Args:
+            data (pandas.DataFrame): First batch of cleaned data
+        """
+        self.process = hyperapi.HyperProcess(telemetry=hyperapi.Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU)
+        self.connection = hyperapi.Connection(endpoint=self.process.endpoint, database=self.staging_path,
+                                              create_mode=hyperapi.CreateMode.CREATE_AND_REPLACE)
+        self.connection.catalog.create_schema('Extract')
+        definition = hyperapi.TableDefinition(
+            hyperapi.TableName('Extract', 'Extract'),
+            [hyperapi.TableDefinition.Column(column, _hyper_type(dtype), hyperapi.NULLABLE)
+             for column, dtype in data.dtypes.items()])
+        self.connection.catalog.create_table(definition)
+        self.inserter = hyperapi.Inserter(self.connection, definition)
+
+    def write(self, data):
+        """
+        Add cleaned rows to the extract
+
+        Args:
+            data (pandas.DataFrame): Cleaned data after apply_clean_schema
+        """
+        if self.inserter is None:
+            self._open(data)
+
+        # Hyper takes Python values: None for missing, dates for the date column
+        rows = data.astype(object)
+        for column in data.columns:
+            if pd.api.types.is_datetime64_any_dtype(data[column]):
+                rows[column] = data[column].dt.date
+        rows = rows.where(data.notna(), None)
+        self.inserter.add_rows(rows.itertuples(index=False, name=None))
+        self.rows += len(data)
+
+    def _shutdown(self):
+        for resource in (self.inserter, self.connection, self.process):
+            if resource is not None:
+                resource.close()
+        self.inserter = self.connection = self.process = None
+
+    def close(self):
+        """
+        Commit the inserted rows and swap the finished extract into place
+        """
+        if self.inserter is not None:
+            self.inserter.execute()
+        self._shutdown()
+        if os.path.exists(self.staging_path):
+            os.replace(self.staging_path, self.path)
+        print(f"Wrote {self.rows} records to {self}")
+
+    def abort(self):
+        """
+        Discard the partially written extract, leaving the previous one in place
+        """
+        self._shutdown()
+        if os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+
+def open_extract_writers(parquet_directory=None, hyper_path=None, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                         column_types=None):
+    """
+    Create the extract writers selected on the command line
+
+    Args:
+        parquet_directory (str): Directory for the partitioned Parquet extract, None to skip
+        hyper_path (str): File for the Tableau Hyper extract, None to skip
+        row_group_size (int): Rows per Parquet row group
+        column_types (dict): Column name to SQLAlchemy type of the Parquet columns, e.g. from CLEAN_SCHEMA
+
+    Returns:
+        list: Open extract writers, empty when no export was requested
+    """
+    writers = []
+    if parquet_directory:
+        writers.append(ParquetExtractWriter(parquet_directory, row_group_size, column_types=column_types))
+    if hyper_path:
+        writers.append(HyperExtractWriter(hyper_path))
+    return writers
+
+def write_extracts(writers, data):
+    """
+    Stream one batch of cleaned rows to every extract writer
+
+    Args:
+        writers (list): Writers from open_extract_writers
+        data (pandas.DataFrame): Cleaned data after apply_clean_schema
+    """
+    with metrics.stage('export', len(data)):
+        for writer in writers:
+            writer.write(data)
+
+def close_extract_writers(writers, success=True):
+    """
+    Finish every extract, or discard them all when the run failed
+
+    Args:
+        writers (list): Writers from open_extract_writers
+        success (bool): Whether the run producing the rows succeeded
+
+    Returns:
+        bool: Success status of the export
+    """
+    try:
+        with metrics.stage('export'):
+            for writer in writers:
+                if success:
+                    writer.close()
+                else:
+                    writer.abort()
+        return success
+
+    except Exception as e:
+        # Handle and log any errors while finishing the extracts
+        print(f"Error finishing extract export: {str(e)}")
+        for writer in writers:
+            writer.abort()
+        return False
@@ -0,0 +1,327 @@
+import cProfile
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import event
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then reported as None
+    resource = None
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far
+
+    Returns:
+        float: Peak RSS in MiB, or None where the resource module is unavailable
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class MetricsRecorder:
+    """
+    Collects stage timings and database round-trips for one run of a script
+
+    Stages may be entered many times (once per chunk); every entry is kept
+    and totals per stage name are computed when the run is written out.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Drop everything recorded so far and restart the run clock
+        """
+        self.started = datetime.now()
+        self.stages = []
+        self.round_trips = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """
+        Time a block as one entry of a stage
+
+        Args:
+            name (str): Stage name, dotted for cleaning steps (e.g. 'clean.age')
+            rows (int): Rows handled, may also be set on the yielded record
+
+        Yields:
+            dict: The stage record, so rows can be filled in once known
+        """
+        record = {'stage': name, 'rows': rows}
+        peak_before = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            peak_after = peak_rss_mb()
+            record['seconds'] = round(seconds, 6)
+            record['rows_per_second'] = round(record['rows'] / seconds, 1) if record['rows'] and seconds else None
+            # The process peak only rises, so the growth is what this stage added on top of
+            # everything before it; a stage that stays below an earlier peak reports 0
+            record['peak_rss_growth_mb'] = round(peak_after - peak_before, 3) if peak_after is not None else None
+            record['process_peak_rss_mb'] = peak_after
+            self.stages.append(record)
+
+    def record_round_trip(self, kind, seconds):
+        """
+        Count one database round-trip and its latency
+
+        Args:
+            kind (str): Statement kind, such as 'SELECT' or 'INSERT executemany'
+            seconds (float): Time the call took
+        """
+        stats = self.round_trips.setdefault(kind, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def add_counts(self, name, counts):
+        """
+        Add to named counters that are summed over the run, such as format hits per chunk
+
+        Args:
+            name (str): Counter group, dotted like stage names (e.g. 'clean.date_formats')
+            counts (dict): Key to count to add
+        """
+        totals = self.counts.setdefault(name, {})
+        for key, count in counts.items():
+            totals[key] = totals.get(key, 0) + int(count)
+
+    @contextlib.contextmanager
+    def round_trip(self, kind):
+        """
+        Time a block as one database round-trip
+
+        Args:
+            kind (str): Statement kind
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_round_trip(kind, time.perf_counter() - start)
+
+    def stage_totals(self):
+        """
+        Sum the entries of each stage
+
+        Returns:
+            dict: Stage name to calls, seconds, rows and rows per second
+        """
+        totals = {}
+        for record in self.stages:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'rows': 0})
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['rows'] += record['rows'] or 0
+
+        for total in totals.values():
+            total['seconds'] = round(total['seconds'], 6)
+            total['rows_per_second'] = round(total['rows'] / total['seconds'], 1) if total['rows'] and total['seconds'] else None
+        return totals
+
+    def round_trip_totals(self):
+        """
+        Round-trip counts with total, mean and max latency per statement kind
+
+        Returns:
+            dict: Statement kind to count and latencies in seconds
+        """
+        return {kind: {'count': stats['count'],
+                       'seconds': round(stats['seconds'], 6),
+                       'mean_seconds': round(stats['seconds'] / stats['count'], 6),
+                       'max_seconds': round(stats['max_seconds'], 6)}
+                for kind, stats in self.round_trips.items()}
+
+    def to_dict(self, script, argv):
+        """
+        Build the structured record of this run
+
+        Args:
+            script (str): Name of the script that ran
+            argv (list): Command line arguments of the run
+
+        Returns:
+            dict: JSON serialisable run record
+        """
+        return {
+            'script': script,
+            'argv': list(argv),
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_seconds': round((datetime.now() - self.started).total_seconds(), 6),
+            'pid': os.getpid(),
+            'peak_rss_mb': peak_rss_mb(),
+            'totals': self.stage_totals(),
+            'round_trips': self.round_trip_totals(),
+            'counts': self.counts,
+            'stages': self.stages,
+        }
+
+# Recorder shared by every module of the running process
+METRICS = MetricsRecorder()
+
+def stage(name, rows=None):
+    """
+    Time a block as one entry of a stage on the shared recorder
+
+    Args:
+        name (str): Stage name
+        rows (int): Rows handled, may also be set on the yielded record
+
+    Returns:
+        Context manager yielding the stage record
+    """
+    return METRICS.stage(name, rows)
+
+def round_trip(kind):
+    """
+    Time a block as one database round-trip on the shared recorder
+
+    Args:
+        kind (str): Statement kind
+
+    Returns:
+        Context manager timing the call
+    """
+    return METRICS.round_trip(kind)
+
+def add_counts(name, counts):
+    """
+    Add to named run-level counters on the shared recorder
+
+    Args:
+        name (str): Counter group
+        counts (dict): Key to count to add
+    """
+    METRICS.add_counts(name, counts)
+
+def timed(name, rows=None):
+    """
+    Decorator recording every call of a function as an entry of a stage
+
+    Args:
+        name (str): Stage name
+        rows (callable): Computes the row count from the function's return value
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.stage(name) as record:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    record['rows'] = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def _statement_kind(statement, executemany):
+    """
+    Short label for a SQL statement, its leading keyword
+
+    Args:
+        statement (str): SQL text
+        executemany (bool): Whether the statement ran with a parameter array
+
+    Returns:
+        str: Label such as 'SELECT' or 'INSERT executemany'
+    """
+    words = statement.split(None, 1)
+    kind = words[0].upper() if words else 'OTHER'
+    return f"{kind} executemany" if executemany else kind
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info['metrics_start'].pop()
+    METRICS.record_round_trip(_statement_kind(statement, executemany), time.perf_counter() - start)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, so its start time is popped
+    # here; otherwise it stays on the pooled connection's stack for good
+    conn = exception_context.connection
+    starts = conn.info.get('metrics_start') if conn is not None else None
+    if starts and exception_context.statement is not None:
+        executemany = bool(exception_context.execution_context and exception_context.execution_context.executemany)
+        METRICS.record_round_trip(_statement_kind(exception_context.statement, executemany),
+                                  time.perf_counter() - starts.pop())
+
+def instrument_engine(engine):
+    """
+    Count every statement a SQLAlchemy engine sends as a round-trip
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Engine to instrument
+    """
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+def write_metrics(path, script, argv):
+    """
+    Append the current run as one JSON line to a metrics file
+
+    One line per run lets nightly jobs keep appending to the same file.
+
+    Args:
+        path (str): Metrics file
+        script (str): Name of the script that ran
+        argv (list): Command line arguments of the run
+    """
+    with open(path, 'a') as f:
+        f.write(json.dumps(METRICS.to_dict(script, argv)) + '\n')
+    print(f"Metrics written to {path}")
+
+def print_summary():
+    """
+    Print the per-stage totals and round-trip counts of the current run
+    """
+    print("\nStage timings:")
+    for name, total in METRICS.stage_totals().items():
+        rate = f"{total['rows_per_second']:>14,.0f} rows/s" if total['rows_per_second'] else ""
+        print(f"  {name:<20} {total['calls']:>6}x {total['seconds']:>10.3f}s {rate}")
+    for kind, stats in METRICS.round_trip_totals().items():
+        print(f"  {kind:<20} {stats['count']:>6} round-trips, mean {stats['mean_seconds'] * 1000:.2f} ms, "
+              f"max {stats['max_seconds'] * 1000:.2f} ms")
+    for name, counts in METRICS.counts.items():
+        print(f"  {name:<20} " + ", ".join(f"{key}={count}" for key, count in counts.items() if count))
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Run a block under cProfile and dump the stats, a no-op when path is None
+
+    The dump can be read with pstats or snakeviz. For sampling profilers such
+    as py-spy, attach to the process instead; every stage is a named function.
+
+    Args:
+        path (str): File for the profile stats, None to skip profiling
+    """
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
@@ -0,0 +1,88 @@
+import queue
+import threading
+
+# Default number of items a stage may run ahead of its consumer
+DEFAULT_DEPTH = 2
+
+# Marker put on a stage's queue once its input is exhausted
+_DONE = object()
+
+class _StageError:
+    """
+    Exception raised inside a stage thread, handed to the consumer to re-raise
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+def _put(buffer, item, stop):
+    """
+    Put an item on a bounded queue, giving up once the consumer has stopped
+
+    Args:
+        buffer (queue.Queue): Queue between the stage and its consumer
+        item: Item to hand over
+        stop (threading.Event): Set when the consumer no longer reads
+
+    Returns:
+        bool: True if the item was queued
+    """
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def prefetch(items, depth=DEFAULT_DEPTH, name=None):
+    """
+    Run an iterable in a background thread as one stage of a pipeline
+
+    The stage produces items while the caller consumes earlier ones, so
+    database I/O in one stage overlaps with work in the next. Stages compose:
+    prefetching a generator that consumes another prefetched generator gives
+    a three-stage pipeline, one thread per stage. The queue between stages
+    holds at most depth items, so a fast producer blocks (backpressure)
+    instead of filling memory. Errors raised by the stage are re-raised in
+    the consumer; a consumer that stops early stops the stage as well.
+
+    Args:
+        items (iterable): Items to produce, typically a generator of chunks
+        depth (int): Maximum number of items produced ahead of the consumer
+        name (str): Thread name, for debugging and profilers
+
+    Yields:
+        Items of the iterable, in order
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(buffer, item, stop):
+                    return
+            _put(buffer, _DONE, stop)
+        except BaseException as e:
+            _put(buffer, _StageError(e), stop)
+        finally:
+            # Finish the iterable in the thread that ran it, releasing cursors and files
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
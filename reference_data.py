@@ -0,0 +1,179 @@
+from difflib import get_close_matches
+from functools import lru_cache
+
+# First and last names the generator draws from, the dictionary for name repair
+FIRST_NAMES = ["John", "Jane", "Michael", "Emily", "David", "Sarah", "Robert", "Maria", "James", "Lisa",
+               "Thomas", "Jessica", "Daniel", "Jennifer", "Christopher", "Linda", "Matthew", "Patricia",
+               "Andrew", "Elizabeth"]
+
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Miller", "Davis", "Garcia", "Rodriguez",
+              "Wilson", "Martinez", "Anderson", "Taylor", "Thomas", "Hernandez", "Moore", "Martin",
+              "Jackson", "Thompson", "White"]
+
+# Cities and states the generator draws locations from
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio",
+          "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville", "San Francisco", "Columbus",
+          "Indianapolis", "Seattle", "Denver", "Washington DC", "Boston", "Nashville"]
+
+STATES = ["NY", "CA", "IL", "TX", "AZ", "PA", "FL", "OH", "GA", "NC", "WA", "CO", "DC", "MA", "TN", "VA"]
+
+# Home state of every generator city, used when a location names no usable state
+CITY_STATES = {
+    "New York": "NY", "Los Angeles": "CA", "Chicago": "IL", "Houston": "TX", "Phoenix": "AZ",
+    "Philadelphia": "PA", "San Antonio": "TX", "San Diego": "CA", "Dallas": "TX", "San Jose": "CA",
+    "Austin": "TX", "Jacksonville": "FL", "San Francisco": "CA", "Columbus": "OH", "Indianapolis": "IN",
+    "Seattle": "WA", "Denver": "CO", "Washington DC": "DC", "Boston": "MA", "Nashville": "TN",
+}
+
+# USPS codes and full names of every state plus DC
+US_STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana",
+    "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+}
+
+def _index_key(value):
+    """
+    Lookup key for a city or state spelling: lower case with single spaces and no dots
+
+    Args:
+        value (str): City or state as written
+
+    Returns:
+        str: Normalized key
+    """
+    return ' '.join(value.replace('.', '').lower().split())
+
+# Precomputed lookups keyed by _index_key: state code or full name -> code,
+# and city -> (canonical city name, home state)
+STATE_INDEX = {_index_key(code): code for code in US_STATE_NAMES}
+STATE_INDEX.update({_index_key(name): code for code, name in US_STATE_NAMES.items()})
+STATE_INDEX.update({'washington dc': 'DC', 'washington d c': 'DC'})
+
+CITY_INDEX = {_index_key(city): (city, state) for city, state in CITY_STATES.items()}
+# The generator's "Washington DC" already carries its state, render it as "Washington, DC"
+CITY_INDEX[_index_key('Washington DC')] = ('Washington', 'DC')
+
+# Full state names only, the candidates for typo correction
+_STATE_NAME_KEYS = [_index_key(name) for name in US_STATE_NAMES.values()]
+
+def lookup_state(value):
+    """
+    Resolve a state code, full name or slightly misspelled full name to its code
+
+    Args:
+        value (str): State as written
+
+    Returns:
+        str: Two-letter state code, or None when it cannot be resolved
+    """
+    key = _index_key(value)
+    if key in STATE_INDEX:
+        return STATE_INDEX[key]
+
+    # Typos are only corrected for full names: a wrong two-letter code is ambiguous
+    if len(key) > 3:
+        match = get_close_matches(key, _STATE_NAME_KEYS, n=1, cutoff=0.8)
+        if match:
+            return STATE_INDEX[match[0]]
+    return None
+
+def lookup_city(value):
+    """
+    Find a known city by any spelling of its name
+
+    Args:
+        value (str): City as written
+
+    Returns:
+        tuple: (canonical city name, home state), or None for an unknown city
+    """
+    return CITY_INDEX.get(_index_key(value))
+
+# Known name tokens in lower case, mapped to their canonical spelling
+NAME_TOKENS = {name.lower(): name for name in FIRST_NAMES + LAST_NAMES}
+
+def _deletions(token):
+    """
+    The token itself and every string obtained by deleting one character
+
+    Args:
+        token (str): Lower case token
+
+    Returns:
+        set: Deletion variants
+    """
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+# Blocking index for edit distance one: every deletion variant of a known token
+# points back to the tokens it came from. Two tokens within one substitution,
+# insertion or deletion of each other always share a variant, so a lookup only
+# compares against the handful of tokens in the matching blocks.
+NAME_DELETION_INDEX = {}
+for _token in NAME_TOKENS:
+    for _variant in _deletions(_token):
+        NAME_DELETION_INDEX.setdefault(_variant, set()).add(_token)
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance between two strings
+
+    Args:
+        a (str): First string
+        b (str): Second string
+
+    Returns:
+        int: Minimum number of single-character insertions, deletions and substitutions
+    """
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+@lru_cache(maxsize=None)
+def lookup_name_token(token):
+    """
+    Repair a name token against the known-names dictionary
+
+    Tokens within one edit of exactly one known name are corrected to it,
+    and two known names joined by a mistyped space are split again;
+    ambiguous, short or unknown tokens are only title-cased. Results are
+    memoized, so each distinct token is resolved once per process.
+
+    Args:
+        token (str): Name token as written
+
+    Returns:
+        str: Canonical spelling of the token
+    """
+    key = token.lower()
+    if key in NAME_TOKENS:
+        return NAME_TOKENS[key]
+
+    # Initials and other very short tokens are too ambiguous to repair
+    if len(key) < 3 or not key.isalpha():
+        return token.title()
+
+    candidates = set()
+    for variant in _deletions(key):
+        candidates |= NAME_DELETION_INDEX.get(variant, set())
+    matches = [candidate for candidate in candidates if edit_distance(key, candidate) <= 1]
+
+    if len(matches) == 1:
+        return NAME_TOKENS[matches[0]]
+
+    # A typo over the space glues two names together: "Johnxsmith" -> "John Smith"
+    for i in range(2, len(key) - 2):
+        if key[:i] in NAME_TOKENS and key[i + 1:] in NAME_TOKENS:
+            return f"{NAME_TOKENS[key[:i]]} {NAME_TOKENS[key[i + 1:]]}"
+    return token.title()
@@ -0,0 +1,256 @@
+import pandas as pd
+from datetime import datetime
+from pandas.api.types import CategoricalDtype
+import metrics
+
+# Dimensions the Spend Analysis workbook slices AmountSpent by
+CUBE_DIMENSIONS = ['State', 'ProductCategory', 'AgeGroup', 'Gender', 'PurchaseMonth']
+
+# Summary tables written next to the cleaned table, by suffix, with their grouping
+CUBE_TABLES = {
+    'SpendCube': CUBE_DIMENSIONS,
+    'SpendByState': ['State'],
+    'SpendByProductCategory': ['ProductCategory'],
+    'SpendByAgeGroup': ['AgeGroup'],
+    'SpendByGender': ['Gender'],
+    'SpendByPurchaseMonth': ['PurchaseMonth'],
+}
+
+# Percentiles of AmountSpent stored per group, by output column
+PERCENTILES = {'P25Spent': 0.25, 'MedianSpent': 0.5, 'P75Spent': 0.75, 'P90Spent': 0.9}
+
+# Measures that can be combined across batches without the underlying rows
+ADDITIVE_MEASURES = ['RowCount', 'AmountCount', 'TotalSpent', 'MinSpent', 'MaxSpent']
+
+def cube_table_name(clean_table, suffix):
+    """
+    Name of a summary table stored next to the cleaned table
+
+    Args:
+        clean_table (str): Cleaned table name
+        suffix (str): Key of CUBE_TABLES
+
+    Returns:
+        str: Summary table name
+    """
+    return f"{clean_table}_{suffix}"
+
+def cube_frame(data):
+    """
+    Reduce cleaned data to the cube dimensions and AmountSpent
+
+    After apply_clean_schema every dimension is categorical, so a row costs
+    a few bytes of codes plus the float32 amount. Chunked runs keep one frame
+    per chunk and join them with combine_cube_frames.
+
+    Args:
+        data (pandas.DataFrame): Cleaned data
+
+    Returns:
+        pandas.DataFrame: Dimension columns and AmountSpent
+    """
+    return data[CUBE_DIMENSIONS + ['AmountSpent']]
+
+def combine_cube_frames(parts):
+    """
+    Concatenate the cube frames of several chunks, keeping the dimensions categorical
+
+    State and ProductCategory get the categories seen in their own chunk, and
+    pd.concat turns categoricals with different categories into full text
+    columns. Every part is recoded onto the sorted union of the categories
+    first, the order apply_clean_schema gives a full table, so the codes stay
+    compact.
+
+    Args:
+        parts (list): Frames from cube_frame
+
+    Returns:
+        pandas.DataFrame: All rows of the parts
+    """
+    combined = {}
+    for column in CUBE_DIMENSIONS:
+        values = [part[column] for part in parts]
+        if len({value.dtype for value in values}) > 1 and all(
+                isinstance(value.dtype, CategoricalDtype) for value in values):
+            categories = sorted(set().union(*(value.cat.categories for value in values)))
+            dtype = CategoricalDtype(categories)
+            values = [value.astype(dtype) for value in values]
+        combined[column] = pd.concat(values, ignore_index=True)
+    combined['AmountSpent'] = pd.concat([part['AmountSpent'] for part in parts], ignore_index=True)
+    return pd.DataFrame(combined)
+
+def _amounts(data):
+    """
+    AmountSpent as the cleaned table stores it, float64 rounded to cents
+
+    Full builds and incremental refreshes (which start from stored, rounded
+    totals) then aggregate the same values as SUM(AmountSpent) would.
+
+    Args:
+        data (pandas.DataFrame): Cleaned data with AmountSpent, float32 after apply_clean_schema
+
+    Returns:
+        pandas.Series: Amounts in cents precision
+    """
+    return data['AmountSpent'].astype('float64').round(2)
+
+def _finest_grain(data):
+    """
+    Additive measures at the finest grain, all dimensions, in one groupby pass
+
+    Args:
+        data (pandas.DataFrame): Cleaned data with the cube dimensions and AmountSpent
+
+    Returns:
+        pandas.DataFrame: One row per dimension combination with ADDITIVE_MEASURES
+    """
+    amounts = _amounts(data)
+    grouped = amounts.groupby([data[column] for column in CUBE_DIMENSIONS], observed=True, dropna=False)
+    return grouped.agg(RowCount='size', AmountCount='count', TotalSpent='sum',
+                       MinSpent='min', MaxSpent='max').reset_index()
+
+def _roll_up(finest, dimensions):
+    """
+    Aggregate the finest grain up to a coarser grouping
+
+    Args:
+        finest (pandas.DataFrame): Output of _finest_grain, or combined partials
+        dimensions (list): Dimensions to keep
+
+    Returns:
+        pandas.DataFrame: Additive measures per group of the coarser grouping
+    """
+    grouped = finest.groupby(dimensions, observed=True, dropna=False)
+    return grouped.agg(RowCount=('RowCount', 'sum'), AmountCount=('AmountCount', 'sum'),
+                       TotalSpent=('TotalSpent', 'sum'), MinSpent=('MinSpent', 'min'),
+                       MaxSpent=('MaxSpent', 'max')).reset_index()
+
+def _percentiles(data, dimensions):
+    """
+    Exact AmountSpent percentiles per group; these need the rows, so are not additive
+
+    Args:
+        data (pandas.DataFrame): Cleaned data with the cube dimensions and AmountSpent
+        dimensions (list): Grouping dimensions
+
+    Returns:
+        pandas.DataFrame: One column per entry of PERCENTILES
+    """
+    amounts = _amounts(data)
+    grouped = amounts.groupby([data[column] for column in dimensions], observed=True, dropna=False)
+    quantiles = grouped.quantile(list(PERCENTILES.values())).unstack()
+    quantiles.columns = list(PERCENTILES)
+    return quantiles.reset_index()
+
+def _finish(table, dimensions, refreshed_at):
+    """
+    Add the derived mean, round money columns and use plain text dimensions
+
+    Args:
+        table (pandas.DataFrame): Summary table
+        dimensions (list): Dimension columns of the table
+        refreshed_at (datetime): Time of this refresh
+
+    Returns:
+        pandas.DataFrame: Table ready to write
+    """
+    table = table.copy()
+    for column in dimensions:
+        # Categoricals from the schema become text, so stored and new groups line up
+        table[column] = table[column].astype(object).where(table[column].notna(), None)
+    # Mean of the rounded total, the one an incremental refresh finds stored
+    table['TotalSpent'] = table['TotalSpent'].round(2)
+    table['AvgSpent'] = table['TotalSpent'] / table['AmountCount'].where(table['AmountCount'] > 0)
+    money = ['TotalSpent', 'MinSpent', 'MaxSpent', 'AvgSpent'] + list(PERCENTILES)
+    table[money] = table[money].round(2)
+    table['RefreshedAt'] = refreshed_at
+    return table[dimensions + ADDITIVE_MEASURES + ['AvgSpent'] + list(PERCENTILES) + ['PercentilesAsOf', 'RefreshedAt']]
+
+def build_spend_cube(data):
+    """
+    Compute every summary table of CUBE_TABLES from the full cleaned data
+
+    Args:
+        data (pandas.DataFrame): All cleaned rows (at least the cube dimensions and AmountSpent)
+
+    Returns:
+        dict: CUBE_TABLES suffix to summary DataFrame
+    """
+    refreshed_at = datetime.now()
+    finest = _finest_grain(data)
+
+    tables = {}
+    for suffix, dimensions in CUBE_TABLES.items():
+        table = _roll_up(finest, dimensions).merge(_percentiles(data, dimensions), on=dimensions, how='left')
+        table['PercentilesAsOf'] = refreshed_at
+        tables[suffix] = _finish(table, dimensions, refreshed_at)
+    return tables
+
+def _combine(existing, delta, dimensions):
+    """
+    Merge stored summary rows with the summary of newly cleaned rows
+
+    Counts and totals add up, min and max combine, and the mean is derived
+    again. Percentiles of groups that already existed are kept from the last
+    full build (see PercentilesAsOf); new groups take the delta's percentiles,
+    which are exact because the delta holds all of their rows.
+
+    Args:
+        existing (pandas.DataFrame): Stored summary table
+        delta (pandas.DataFrame): Summary of the new rows, from build_spend_cube
+        dimensions (list): Dimension columns of the table
+
+    Returns:
+        pandas.DataFrame: Combined summary rows
+    """
+    existing = existing.copy()
+    for column in dimensions:
+        existing[column] = existing[column].astype(object).where(existing[column].notna(), None)
+    # SQLite hands timestamps back as text
+    existing['PercentilesAsOf'] = pd.to_datetime(existing['PercentilesAsOf'])
+
+    combined = existing.merge(delta, on=dimensions, how='outer', suffixes=('', '_new'))
+    is_new = combined['RowCount'].isna()
+
+    for column in ['RowCount', 'AmountCount', 'TotalSpent']:
+        combined[column] = combined[column].fillna(0) + combined[f'{column}_new'].fillna(0)
+    combined['MinSpent'] = combined[['MinSpent', 'MinSpent_new']].min(axis=1)
+    combined['MaxSpent'] = combined[['MaxSpent', 'MaxSpent_new']].max(axis=1)
+    for column in list(PERCENTILES) + ['PercentilesAsOf']:
+        combined[column] = combined[column].where(~is_new, combined[f'{column}_new'])
+
+    combined[['RowCount', 'AmountCount']] = combined[['RowCount', 'AmountCount']].astype('int64')
+    return combined
+
+@metrics.timed('cube')
+def write_spend_cube(data, backend, clean_table, incremental=False):
+    """
+    Write the summary tables next to the cleaned table
+
+    Args:
+        data (pandas.DataFrame): All cleaned rows, or only the new ones when incremental
+        backend (StorageBackend): Backend holding the cleaned table
+        clean_table (str): Cleaned table name
+        incremental (bool): Fold data into the stored tables instead of rebuilding them
+
+    Returns:
+        bool: Success status of the refresh
+    """
+    print(f"{'Refreshing' if incremental else 'Building'} spend cube tables from {len(data)} records...")
+
+    try:
+        tables = build_spend_cube(data)
+        for suffix, table in tables.items():
+            table_name = cube_table_name(clean_table, suffix)
+            if incremental and backend.has_table(table_name):
+                dimensions = CUBE_TABLES[suffix]
+                table = _finish(_combine(backend.read_table(table_name), table, dimensions), dimensions,
+                                datetime.now())
+            backend.write_table(table, table_name, 'replace')
+            print(f"Wrote {len(table)} rows to {backend.qualified_name(table_name)}")
+        return True
+
+    except Exception as e:
+        # Handle and log any errors during the cube refresh
+        print(f"Error writing spend cube tables: {str(e)}")
+        return False
@@ -0,0 +1,534 @@
+import os
+import shutil
+import pandas as pd
+import metrics
+from sqlalchemy import BigInteger, Date, DateTime, Float, Integer, Numeric, SmallInteger, String, create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from urllib.parse import quote_plus
+
+# Connection pool settings of every SQLAlchemy engine, changed with configure_pool.
+# Pre-ping checks a pooled connection with a cheap round-trip before handing it
+# out, so connections dropped by the server are replaced instead of failing a stage.
+POOL_OPTIONS = {'pool_size': 5, 'max_overflow': 10, 'pool_pre_ping': True, 'pool_recycle': 1800}
+
+# Engines shared by every backend object pointing at the same database, keyed by
+# URL and executemany mode, so load, write and insert stages reuse one pool
+_ENGINES = {}
+
+def configure_pool(pool_size=None, max_overflow=None, pre_ping=None, recycle=None):
+    """
+    Change the connection pool settings of engines created from now on
+
+    Engines created with other settings are disposed, so the next stage
+    opens a pool with the new settings.
+
+    Args:
+        pool_size (int): Connections kept open per engine
+        max_overflow (int): Extra connections allowed while the pool is exhausted
+        pre_ping (bool): Test connections before handing them out
+        recycle (int): Seconds after which a connection is replaced, -1 to never recycle
+    """
+    updates = {'pool_size': pool_size, 'max_overflow': max_overflow, 'pool_pre_ping': pre_ping,
+               'pool_recycle': recycle}
+    updates = {key: value for key, value in updates.items() if value is not None}
+    if any(POOL_OPTIONS[key] != value for key, value in updates.items()):
+        POOL_OPTIONS.update(updates)
+        dispose_engines()
+
+def dispose_engines():
+    """
+    Close every pooled connection and forget the shared engines
+    """
+    for engine in _ENGINES.values():
+        engine.dispose()
+    _ENGINES.clear()
+
+class StorageBackend:
+    """
+    Common load/write API shared by every storage backend
+
+    Subclasses implement read_table, write_table and has_table. The pipeline
+    only talks to this interface, so the same load -> clean -> write run
+    works against SQL Server, local databases or columnar files.
+    """
+
+    # Human readable kind of storage, used in progress messages
+    kind = "storage"
+
+    def qualified_name(self, table_name):
+        """
+        Name of a table including its location, for progress messages
+
+        Args:
+            table_name (str): Table name
+
+        Returns:
+            str: Location-qualified table name
+        """
+        return f"{self.location}.{table_name}"
+
+    def read_table(self, table_name, chunksize=None):
+        """
+        Read a whole table, or stream it in chunks
+
+        Args:
+            table_name (str): Table to read
+            chunksize (int): Rows per chunk, None to read everything at once
+
+        Returns:
+            pandas.DataFrame or iterator of pandas.DataFrame: Table contents
+        """
+        raise NotImplementedError
+
+    def read_arrow(self, table_name):
+        """
+        Read a whole table as an Arrow table
+
+        Args:
+            table_name (str): Table to read
+
+        Returns:
+            pyarrow.Table: Table contents
+        """
+        import pyarrow as pa
+        return pa.Table.from_pandas(self.read_table(table_name), preserve_index=False)
+
+    def write_table(self, data, table_name, if_exists='replace', dtype=None, chunksize=None, method=None,
+                    fast_executemany=False):
+        """
+        Write a DataFrame to a table
+
+        Args:
+            data (pandas.DataFrame): Data to write
+            table_name (str): Target table
+            if_exists (str): 'replace' to recreate the table, 'append' to add rows
+            dtype (dict): Column name to SQLAlchemy type, used by SQL backends
+            chunksize (int): Rows per insert batch, used by SQL backends
+            method (str): to_sql insertion method, used by SQL backends
+            fast_executemany (bool): Use the fast executemany engine, used by SQL backends
+        """
+        raise NotImplementedError
+
+    def has_table(self, table_name):
+        """
+        Check whether a table exists
+
+        Args:
+            table_name (str): Table name
+
+        Returns:
+            bool: True if the table exists
+        """
+        raise NotImplementedError
+
+class SQLAlchemyBackend(StorageBackend):
+    """
+    Backend for databases reached through a SQLAlchemy engine
+    """
+
+    kind = "SQL database"
+
+    def __init__(self, url, location):
+        self.url = url
+        self.location = location
+
+    def __str__(self):
+        return self.location
+
+    @property
+    def dialect_name(self):
+        """
+        SQLAlchemy dialect of the database, read from the URL without loading the driver
+
+        Returns:
+            str: Dialect name such as 'mssql' or 'sqlite'
+        """
+        return make_url(self.url).get_backend_name()
+
+    def _engine_options(self, fast_executemany):
+        """
+        Extra create_engine keyword arguments for this database
+
+        Args:
+            fast_executemany (bool): Whether the fast executemany path was requested
+
+        Returns:
+            dict: Keyword arguments for create_engine
+        """
+        return {}
+
+    def create_engine(self, fast_executemany=False):
+        """
+        Return the pooled SQLAlchemy engine for this database, creating it on first use
+
+        The engine is shared with every other backend object for the same URL,
+        so connections opened by one stage are reused by the next.
+
+        Args:
+            fast_executemany (bool): Send executemany parameter arrays in one round-trip where supported
+
+        Returns:
+            sqlalchemy.engine.Engine: Database engine
+        """
+        key = (self.url, fast_executemany)
+        if key not in _ENGINES:
+            engine = create_engine(self.url, **POOL_OPTIONS, **self._engine_options(fast_executemany))
+            self._configure_engine(engine)
+            metrics.instrument_engine(engine)
+            _ENGINES[key] = engine
+        return _ENGINES[key]
+
+    def _configure_engine(self, engine):
+        """
+        Hook for database specific engine setup, such as connection event listeners
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Newly created engine
+        """
+
+    def raw_connection(self):
+        """
+        Open a DB-API connection (qmark parameters) for bulk record inserts
+
+        Returns:
+            DB-API connection proxied by the engine's pool
+        """
+        return self.create_engine().raw_connection()
+
+    def read_table(self, table_name, chunksize=None):
+        return self.read_query(f"SELECT * FROM {table_name}", chunksize)
+
+    def read_query(self, query, chunksize=None, params=None):
+        """
+        Run a query, returning all rows at once or streaming them in chunks
+
+        Args:
+            query (str or sqlalchemy.sql.expression.TextClause): Query to run
+            chunksize (int): Rows per chunk, None to read everything at once
+            params (dict): Bound parameters of the query
+
+        Returns:
+            pandas.DataFrame or iterator of pandas.DataFrame: Query results
+        """
+        if chunksize is None:
+            return pd.read_sql(query, self.create_engine(), params=params)
+        return self._read_chunks(query, chunksize, params)
+
+    def _read_chunks(self, query, chunksize, params=None):
+        """
+        Stream query results in chunks from an open result set
+
+        Args:
+            query (str or sqlalchemy.sql.expression.TextClause): Query to run
+            chunksize (int): Rows per chunk
+            params (dict): Bound parameters of the query
+
+        Yields:
+            pandas.DataFrame: Next chunk of rows
+        """
+        # stream_results asks for a server-side cursor where the driver supports one
+        with self.create_engine().connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(query, conn, chunksize=chunksize, params=params):
+                yield chunk
+
+    def write_table(self, data, table_name, if_exists='replace', dtype=None, chunksize=None, method=None,
+                    fast_executemany=False):
+        data.to_sql(table_name, self.create_engine(fast_executemany), if_exists=if_exists, index=False, dtype=dtype,
+                    chunksize=chunksize, method=method)
+
+    def has_table(self, table_name):
+        return inspect(self.create_engine()).has_table(table_name)
+
+class SQLServerBackend(SQLAlchemyBackend):
+    """
+    SQL Server over pyodbc with Windows Authentication
+    """
+
+    kind = "SQL Server"
+
+    def __init__(self, server_name, database_name):
+        # Trusted_Connection=yes means using Windows Authentication
+        conn_str = f"DRIVER={{SQL Server}};SERVER={server_name};DATABASE={database_name};Trusted_Connection=yes;"
+
+        # URL encode the connection string to handle special characters
+        super().__init__(f"mssql+pyodbc:///?odbc_connect={quote_plus(conn_str)}", database_name)
+        self.server_name = server_name
+        self.database_name = database_name
+
+    def __str__(self):
+        return f"{self.database_name} on {self.server_name}"
+
+    def _engine_options(self, fast_executemany):
+        return {'fast_executemany': True} if fast_executemany else {}
+
+class SQLiteBackend(SQLAlchemyBackend):
+    """
+    Local SQLite database file, a stand-in for SQL Server on any machine
+    """
+
+    kind = "SQLite"
+
+    def __init__(self, path):
+        super().__init__(f"sqlite:///{path}", path)
+
+    def _configure_engine(self, engine):
+        # WAL lets a chunked read stay open while another connection writes
+        event.listen(engine, 'connect', lambda conn, record: conn.execute('PRAGMA journal_mode=WAL'))
+
+def _duckdb_type(sql_type):
+    """
+    DuckDB column type for a SQLAlchemy column type
+
+    Args:
+        sql_type (sqlalchemy.types.TypeEngine): Column type, e.g. from CLEAN_SCHEMA
+
+    Returns:
+        str: DuckDB type name, None to keep the type DuckDB infers from the data
+    """
+    # Subclasses first: SmallInteger and BigInteger are Integers, Float is a Numeric
+    if isinstance(sql_type, SmallInteger):
+        return 'SMALLINT'
+    if isinstance(sql_type, BigInteger):
+        return 'BIGINT'
+    if isinstance(sql_type, Integer):
+        return 'INTEGER'
+    if isinstance(sql_type, Float):
+        return 'DOUBLE'
+    if isinstance(sql_type, Numeric):
+        return f'DECIMAL({sql_type.precision}, {sql_type.scale})'
+    if isinstance(sql_type, DateTime):
+        return 'TIMESTAMP'
+    if isinstance(sql_type, Date):
+        return 'DATE'
+    if isinstance(sql_type, String):
+        return 'VARCHAR'
+    return None
+
+class DuckDBBackend(StorageBackend):
+    """
+    Local DuckDB database file, queried natively with Arrow result transfer
+    """
+
+    kind = "DuckDB"
+
+    def __init__(self, path):
+        self.location = path
+        self._conn = None
+
+    def __str__(self):
+        return self.location
+
+    def connect(self):
+        """
+        Return the DuckDB connection, opening it on first use
+
+        Returns:
+            duckdb.DuckDBPyConnection: Database connection
+        """
+        if self._conn is None:
+            import duckdb
+            self._conn = duckdb.connect(self.location)
+        return self._conn
+
+    def read_table(self, table_name, chunksize=None):
+        if chunksize is None:
+            return self.connect().execute(f'SELECT * FROM "{table_name}"').df()
+        return self._read_chunks(table_name, chunksize)
+
+    def _read_chunks(self, table_name, chunksize):
+        """
+        Stream a table as Arrow record batches converted to DataFrames
+
+        Args:
+            table_name (str): Table to read
+            chunksize (int): Rows per chunk
+
+        Yields:
+            pandas.DataFrame: Next chunk of rows
+        """
+        # A separate cursor keeps the stream open while the main connection writes
+        cursor = self.connect().cursor()
+        try:
+            reader = cursor.execute(f'SELECT * FROM "{table_name}"').fetch_record_batch(chunksize)
+            for batch in reader:
+                yield batch.to_pandas()
+        finally:
+            cursor.close()
+
+    def read_arrow(self, table_name):
+        return self.connect().execute(f'SELECT * FROM "{table_name}"').fetch_arrow_table()
+
+    def write_table(self, data, table_name, if_exists='replace', dtype=None, chunksize=None, method=None,
+                    fast_executemany=False):
+        # Categoricals would become ENUMs holding only this frame's categories, rejecting later appends
+        categorical = [column for column in data.columns if isinstance(data[column].dtype, pd.CategoricalDtype)]
+        data = data.assign(**{column: data[column].astype(str) for column in categorical})
+
+        # Cast to the requested column types, like to_sql(dtype=...) on the SQL backends
+        columns = []
+        for column in data.columns:
+            duckdb_type = _duckdb_type(dtype[column]) if dtype and column in dtype else None
+            columns.append(f'CAST("{column}" AS {duckdb_type}) AS "{column}"' if duckdb_type else f'"{column}"')
+        select = f"SELECT {', '.join(columns)} FROM incoming_frame"
+
+        conn = self.connect()
+        conn.register('incoming_frame', data)
+        try:
+            if if_exists == 'replace' or not self.has_table(table_name):
+                conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS {select}')
+            else:
+                names = ', '.join(f'"{column}"' for column in data.columns)
+                conn.execute(f'INSERT INTO "{table_name}" ({names}) {select}')
+        finally:
+            conn.unregister('incoming_frame')
+
+    def has_table(self, table_name):
+        query = "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?"
+        return self.connect().execute(query, [table_name]).fetchone()[0] > 0
+
+def _arrow_type(sql_type):
+    """
+    Arrow column type for a SQLAlchemy column type
+
+    Args:
+        sql_type (sqlalchemy.types.TypeEngine): Column type, e.g. from CLEAN_SCHEMA
+
+    Returns:
+        pyarrow.DataType: Arrow type, None to keep the type Arrow infers from the data
+    """
+    import pyarrow as pa
+
+    # Subclasses first: SmallInteger and BigInteger are Integers, Float is a Numeric
+    if isinstance(sql_type, SmallInteger):
+        return pa.int16()
+    if isinstance(sql_type, BigInteger):
+        return pa.int64()
+    if isinstance(sql_type, Integer):
+        return pa.int32()
+    if isinstance(sql_type, Numeric):
+        # Money is rounded to cents before writing; doubles stay plain numbers for pandas and Tableau
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, String):
+        return pa.string()
+    return None
+
+def arrow_schema(data, dtype=None):
+    """
+    Arrow schema for writing a DataFrame to Parquet files that are appended to later
+
+    Requested column types win over the types Arrow infers from this one
+    batch. Categoricals become plain strings, since their categories differ
+    per batch, and all-null columns become strings rather than the null
+    type, which no later batch could be cast to.
+
+    Args:
+        data (pandas.DataFrame): First batch to write
+        dtype (dict): Column name to SQLAlchemy type, e.g. from CLEAN_SCHEMA
+
+    Returns:
+        pyarrow.Schema: Schema for pa.Table.from_pandas(..., schema=...), without pandas metadata
+    """
+    import pyarrow as pa
+
+    fields = []
+    for field in pa.Schema.from_pandas(data, preserve_index=False):
+        arrow_type = _arrow_type(dtype[field.name]) if dtype and field.name in dtype else None
+        if arrow_type is None and pa.types.is_dictionary(field.type):
+            arrow_type = field.type.value_type
+        elif arrow_type is None and pa.types.is_null(field.type):
+            arrow_type = pa.string()
+        fields.append(field.with_type(arrow_type) if arrow_type is not None else field)
+    return pa.schema(fields)
+
+class ParquetBackend(StorageBackend):
+    """
+    Directory of Parquet datasets, one sub-directory of part files per table
+    """
+
+    kind = "Parquet"
+
+    def __init__(self, directory):
+        self.location = directory
+
+    def __str__(self):
+        return self.location
+
+    def qualified_name(self, table_name):
+        return self._table_path(table_name)
+
+    def _table_path(self, table_name):
+        return os.path.join(self.location, table_name)
+
+    def _dataset(self, table_name):
+        import pyarrow.dataset as ds
+        return ds.dataset(self._table_path(table_name), format='parquet')
+
+    def read_table(self, table_name, chunksize=None):
+        if chunksize is None:
+            return self.read_arrow(table_name).to_pandas()
+        return (batch.to_pandas() for batch in self._dataset(table_name).to_batches(batch_size=chunksize))
+
+    def read_arrow(self, table_name):
+        # Memory-mapped read: column buffers are used in place rather than copied
+        import pyarrow.parquet as pq
+        return pq.read_table(self._table_path(table_name), memory_map=True)
+
+    def write_table(self, data, table_name, if_exists='replace', dtype=None, chunksize=None, method=None,
+                    fast_executemany=False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._table_path(table_name)
+        replace = if_exists == 'replace' or not self.has_table(table_name)
+        if replace:
+            schema = arrow_schema(data, dtype)
+        else:
+            # Appended parts keep the schema of the first part, so the dataset stays readable as one table
+            schema = pq.read_schema(os.path.join(path, 'part-00000.parquet')).remove_metadata()
+        table = pa.Table.from_pandas(data, schema=schema, preserve_index=False)
+
+        if replace:
+            # Write next to the old dataset and swap directories so readers never see a partial table
+            staging_path = f"{path}.staging"
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+            pq.write_table(table, os.path.join(staging_path, 'part-00000.parquet'))
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging_path, path)
+        else:
+            part = len([name for name in os.listdir(path) if name.endswith('.parquet')])
+            pq.write_table(table, os.path.join(path, f'part-{part:05d}.parquet'))
+
+    def has_table(self, table_name):
+        return os.path.isdir(self._table_path(table_name))
+
+# Backends selectable from the command line of both scripts
+BACKENDS = {
+    'sqlserver': SQLServerBackend,
+    'sqlite': SQLiteBackend,
+    'duckdb': DuckDBBackend,
+    'parquet': ParquetBackend,
+}
+
+def get_backend(name, server_name=None, database_name=None, path=None):
+    """
+    Create a storage backend by name
+
+    Args:
+        name (str): Backend name, one of BACKENDS
+        server_name (str): SQL Server instance name, for 'sqlserver'
+        database_name (str): Database name, for 'sqlserver'
+        path (str): Database file or Parquet directory, for the local backends
+
+    Returns:
+        StorageBackend: Configured backend
+    """
+    if name == 'sqlserver':
+        return SQLServerBackend(server_name, database_name)
+    if path is None:
+        raise ValueError(f"The {name} backend needs a path")
+    return BACKENDS[name](path)
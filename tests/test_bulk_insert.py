@@ -0,0 +1,54 @@
+import random
+import sqlite3
+
+import pytest
+
+from Ingestion import generate_unclean_data, insert_chunks
+
+# Stand-in for the SQL Server table: the primary key rejects duplicate CustomerIDs
+CREATE_TABLE_SQL = """
+CREATE TABLE UncleanCustomers (
+    CustomerID INTEGER PRIMARY KEY, Name TEXT, Age TEXT, Gender TEXT, Location TEXT,
+    PurchaseDate TEXT, ProductCategory TEXT, AmountSpent TEXT
+)
+"""
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute(CREATE_TABLE_SQL)
+    yield conn
+    conn.close()
+
+def _records_with_duplicates():
+    random.seed(3)
+    records = generate_unclean_data(20)[1:]
+    # Rows 7 and 15 reuse the CustomerID of an earlier row in the same batch
+    records[7][0] = records[2][0]
+    records[15][0] = records[11][0]
+    return records, [records[7][0], records[15][0]]
+
+@pytest.mark.parametrize('batch_size', [4, 8, 20])
+def test_bulk_insert_bisects_failed_batches(conn, capsys, batch_size):
+    records, bad_ids = _records_with_duplicates()
+
+    inserted = insert_chunks(conn, [records], batch_size=batch_size)
+
+    assert inserted == 18
+    assert conn.execute("SELECT COUNT(*) FROM UncleanCustomers").fetchone()[0] == 18
+    output = capsys.readouterr().out
+    for customer_id in bad_ids:
+        assert f"Error inserting record {customer_id}:" in output
+    assert output.count("Error inserting record") == 2
+
+def test_bulk_insert_matches_row_by_row(conn):
+    records, _ = _records_with_duplicates()
+    row_by_row = sqlite3.connect(':memory:')
+    row_by_row.execute(CREATE_TABLE_SQL)
+
+    assert insert_chunks(conn, [records[:10], records[10:]], batch_size=4) == 18
+    assert insert_chunks(row_by_row, [records[:10], records[10:]]) == 18
+
+    query = "SELECT * FROM UncleanCustomers ORDER BY CustomerID"
+    assert conn.execute(query).fetchall() == row_by_row.execute(query).fetchall()
+    row_by_row.close()
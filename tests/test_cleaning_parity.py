@@ -0,0 +1,61 @@
+import random
+
+import pandas as pd
+import pytest
+
+import clean
+from Ingestion import HEADER, generate_unclean_data, generate_unclean_data_vectorized, records_to_frame
+
+# Engines that must reproduce clean_data, the row-wise reference
+ENGINES = [
+    'vectorized',
+    pytest.param('arrow', marks=pytest.mark.skipif(clean.pa is None, reason="needs pyarrow")),
+]
+
+# Hand-written raw values the generators rarely or never produce
+EDGE_CASES = [
+    # Name, Age, Gender, Location, PurchaseDate, ProductCategory, AmountSpent
+    ('  jOHN smith ', '٣', ' M ', 'New York, NY', '2023-02-30', ' electronics ', '٣.5'),
+    ('MARY', '٣5', 'FEMALE', 'Chicago', 'January 05, 2023', 'BOOKS', '$1,234.56'),
+    ('', '²', 'x', 'Boston/MA', '13/01/2023', '', '12,50'),
+    (None, '25 years', '', '', '', None, '$'),
+    ('anna B. lee', 'NA', None, None, None, 'clothing', ''),
+    ('Ann', '', 'f', 'Nowhere, ZZ', ' 2023.01.05 ', 'Home', None),
+    ('bob', None, 'Male', ' Austin , texas ', 'garbage', 'Toys', '1.2.3'),
+    ('Li', '４２', 'm', 'Springfield', '01-05-23', 'Books', '€45'),
+    ('Zoë', ' 30 ', 'FeMale', 'Denver/Colorado', '5/1/2023', 'Sports', 'N/A'),
+]
+
+def _edge_case_frame():
+    records = [[str(customer_id), *values] for customer_id, values in enumerate(EDGE_CASES, start=1)]
+    frame = pd.DataFrame(records, columns=HEADER)
+    frame['CustomerID'] = frame['CustomerID'].astype('int64')
+    return frame
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_engine_matches_clean_data_on_generated_data(engine):
+    data = generate_unclean_data_vectorized(2000, seed=4)
+    assert clean.check_engine_parity(data, engine)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_engine_matches_clean_data_on_row_generator_data(engine):
+    random.seed(4)
+    data = records_to_frame(generate_unclean_data(1000)[1:])
+    assert clean.check_engine_parity(data, engine)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_engine_matches_clean_data_on_edge_cases(engine):
+    assert clean.check_engine_parity(_edge_case_frame(), engine)
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_engine_matches_clean_data_on_concatenated_chunks(engine):
+    # pd.concat keeps each part's Arrow buffers, so text columns span several chunks
+    parts = [generate_unclean_data_vectorized(500, seed=seed, start_id=1 + 500 * seed) for seed in range(3)]
+    data = pd.concat(parts + [_edge_case_frame()], ignore_index=True)
+    assert clean.check_engine_parity(data, engine)
+
+def test_non_ascii_digits_are_dropped():
+    assert clean.clean_age('٣') is None
+    assert clean.clean_age('²') is None
+    assert clean.clean_age('٣5') == 5
+    assert clean.clean_amount('٣.5') == 0.5
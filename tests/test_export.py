@@ -0,0 +1,24 @@
+import pyarrow.dataset as ds
+
+import clean
+from export import open_extract_writers
+from Ingestion import generate_unclean_data_vectorized
+from storage import SQLiteBackend
+
+def test_chunked_export_with_all_null_column_in_first_chunk(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'customers.db'))
+    raw = generate_unclean_data_vectorized(60, seed=8)
+    # The first chunk cleans to an all-null CanonicalName and Location
+    raw.loc[:9, ['Name', 'Location']] = ''
+    backend.write_table(raw, 'UncleanCustomers')
+
+    extracts = open_extract_writers(str(tmp_path / 'extract'), column_types=clean.CLEAN_SQL_TYPES)
+    assert clean.clean_in_chunks(None, None, 'UncleanCustomers', 'CleanedCustomers', 10, engine='vectorized',
+                                 backend=backend, extracts=extracts)
+
+    extract = ds.dataset(str(tmp_path / 'extract'), partitioning='hive').to_table().to_pandas()
+    stored = backend.read_table('CleanedCustomers')
+    assert len(extract) == len(stored) == 60
+    assert extract['CanonicalName'].notna().sum() == stored['CanonicalName'].notna().sum() > 0
+    assert set(extract.sort_values('CustomerID')['CustomerID'].iloc[:10]) == set(range(1, 11))
+    assert extract[extract['CustomerID'] <= 10]['CanonicalName'].isna().all()
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+
+import clean
+import metrics
+from Ingestion import generate_unclean_data_vectorized
+
+def test_parallel_run_totals_date_format_hits():
+    raw = generate_unclean_data_vectorized(400, seed=4)
+    _, expected = clean.parse_purchase_dates(raw['PurchaseDate'])
+
+    metrics.METRICS.reset()
+    clean.clean_data_parallel(raw, workers=3)
+    assert metrics.METRICS.counts['clean.date_formats'] == expected
+    assert metrics.METRICS.to_dict('clean.py', [])['counts']['clean.date_formats'] == expected
+
+def test_stage_reports_its_own_peak_rss_growth(monkeypatch):
+    # Process peak before and after each stage, in MiB
+    peaks = iter([100.0, 164.0, 164.0, 164.0])
+    monkeypatch.setattr(metrics, 'peak_rss_mb', lambda: next(peaks))
+    recorder = metrics.MetricsRecorder()
+    with recorder.stage('allocate'):
+        pass
+    with recorder.stage('idle'):
+        pass
+
+    allocate, idle = recorder.stages
+    assert (allocate['peak_rss_growth_mb'], allocate['process_peak_rss_mb']) == (64.0, 164.0)
+    # The peak an earlier stage set is not charged again
+    assert (idle['peak_rss_growth_mb'], idle['process_peak_rss_mb']) == (0.0, 164.0)
+
+def test_failed_statement_is_popped_and_counted():
+    engine = create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+    metrics.METRICS.reset()
+    with engine.connect() as conn:
+        with pytest.raises(DBAPIError):
+            conn.execute(text("SELECT * FROM MissingTable"))
+        assert conn.info['metrics_start'] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info['metrics_start'] == []
+    assert metrics.METRICS.round_trips['SELECT']['count'] == 2
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+import clean
+import Ingestion
+from checkpoint import prepare_resume
+from Ingestion import INGEST_JOB, generate_unclean_chunks, insert_chunks_into_backend
+from storage import SQLiteBackend
+
+def _stored(backend, table_name):
+    return backend.read_table(table_name).sort_values('CustomerID', ignore_index=True)
+
+def _fail_on_call(monkeypatch, module, name, call, before_failing=None):
+    # The given call of module.name fails, optionally after doing part of its work
+    original = getattr(module, name)
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == call:
+            if before_failing:
+                before_failing(original, *args, **kwargs)
+            raise RuntimeError("injected failure")
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, failing)
+
+def _ingest(backend, resume_after=None):
+    chunks = generate_unclean_chunks(100, 20, vectorized=True, seed=9, first_id=(resume_after or 0) + 1)
+    insert_chunks_into_backend(chunks, backend, batch_size=7, resume_after=resume_after)
+
+def test_resumed_ingestion_matches_uninterrupted_run(tmp_path, monkeypatch):
+    expected = SQLiteBackend(str(tmp_path / 'expected.db'))
+    _ingest(expected, prepare_resume(expected, INGEST_JOB, 'UncleanCustomers'))
+
+    resumed = SQLiteBackend(str(tmp_path / 'resumed.db'))
+    with monkeypatch.context() as patch:
+        # Batches of 7, 7 and 6 rows per chunk: fail the second batch of the second chunk,
+        # after its first batch is committed above the checkpoint
+        _fail_on_call(patch, Ingestion, '_insert_batch', 5)
+        _ingest(resumed, prepare_resume(resumed, INGEST_JOB, 'UncleanCustomers'))
+    assert len(resumed.read_table('UncleanCustomers')) == 27
+
+    resume_after = prepare_resume(resumed, INGEST_JOB, 'UncleanCustomers')
+    assert resume_after == 20
+    # The rows committed above the checkpoint are gone
+    assert len(resumed.read_table('UncleanCustomers')) == 20
+    _ingest(resumed, resume_after)
+
+    pd.testing.assert_frame_equal(_stored(resumed, 'UncleanCustomers'), _stored(expected, 'UncleanCustomers'))
+
+@pytest.mark.parametrize('fast_write', [False, True])
+def test_resumed_cleaning_matches_uninterrupted_run(tmp_path, monkeypatch, fast_write):
+    def clean_table(path):
+        backend = SQLiteBackend(str(tmp_path / path))
+        if not backend.has_table('UncleanCustomers'):
+            _ingest(backend)
+        success = clean.clean_in_chunks(None, None, 'UncleanCustomers', 'CleanedCustomers', 20, engine='vectorized',
+                                        fast_write=fast_write, backend=backend, resume=True)
+        return backend, success
+
+    expected, success = clean_table('expected.db')
+    assert success
+
+    def write_half(original, data, *args, **kwargs):
+        original(data.iloc[:len(data) // 2], *args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        # The third chunk is half written when the run fails
+        _fail_on_call(patch, clean, 'write_clean_data_to_sql', 3, write_half)
+        assert not clean_table('resumed.db')[1]
+
+    resumed, success = clean_table('resumed.db')
+    assert success
+    assert not resumed.has_table(clean.staging_table_name('CleanedCustomers'))
+
+    pd.testing.assert_frame_equal(_stored(resumed, 'CleanedCustomers'), _stored(expected, 'CleanedCustomers'))
@@ -0,0 +1,49 @@
+import pandas as pd
+
+import clean
+import spend_cube
+from Ingestion import generate_unclean_data_vectorized
+from storage import SQLiteBackend
+
+def _cleaned(num_records, seed, start_id=1):
+    data = generate_unclean_data_vectorized(num_records, seed=seed, start_id=start_id)
+    return clean.apply_clean_schema(clean.clean_data_vectorized(data))
+
+def _additive(table, dimensions):
+    columns = dimensions + spend_cube.ADDITIVE_MEASURES + ['AvgSpent']
+    return table[columns].sort_values(dimensions, ignore_index=True)
+
+def test_incremental_refresh_matches_full_build(tmp_path):
+    old, new = _cleaned(2000, seed=1), _cleaned(2000, seed=2, start_id=2001)
+    full = SQLiteBackend(str(tmp_path / 'full.db'))
+    incremental = SQLiteBackend(str(tmp_path / 'incremental.db'))
+
+    assert spend_cube.write_spend_cube(pd.concat([old, new]), full, 'CleanedCustomers')
+    assert spend_cube.write_spend_cube(old, incremental, 'CleanedCustomers')
+    assert spend_cube.write_spend_cube(new, incremental, 'CleanedCustomers', incremental=True)
+
+    for suffix, dimensions in spend_cube.CUBE_TABLES.items():
+        table_name = spend_cube.cube_table_name('CleanedCustomers', suffix)
+        expected = _additive(full.read_table(table_name), dimensions)
+        actual = _additive(incremental.read_table(table_name), dimensions)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+def test_combined_chunk_frames_match_single_frame_build():
+    raw = generate_unclean_data_vectorized(600, seed=3)
+    data = clean.apply_clean_schema(clean.clean_data_vectorized(raw.copy()))
+    parts = [spend_cube.cube_frame(clean.apply_clean_schema(clean.clean_data_vectorized(raw.iloc[start:start + 40].copy())))
+             for start in range(0, len(raw), 40)]
+    # Small chunks see only some states and product categories
+    assert len({tuple(part['State'].cat.categories) for part in parts}) > 1
+    assert len({tuple(part['ProductCategory'].cat.categories) for part in parts}) > 1
+
+    combined = spend_cube.combine_cube_frames(parts)
+    for column in spend_cube.CUBE_DIMENSIONS:
+        assert isinstance(combined[column].dtype, pd.CategoricalDtype), column
+
+    expected = spend_cube.build_spend_cube(spend_cube.cube_frame(data))
+    actual = spend_cube.build_spend_cube(combined)
+    for suffix, dimensions in spend_cube.CUBE_TABLES.items():
+        columns = dimensions + spend_cube.ADDITIVE_MEASURES + ['AvgSpent'] + list(spend_cube.PERCENTILES)
+        pd.testing.assert_frame_equal(actual[suffix][columns].sort_values(dimensions, ignore_index=True),
+                                      expected[suffix][columns].sort_values(dimensions, ignore_index=True))
@@ -0,0 +1,73 @@
+import pandas as pd
+
+import clean
+from Ingestion import generate_unclean_data_vectorized
+from storage import DuckDBBackend, ParquetBackend
+
+def _cleaned_chunks(sizes, seed=6):
+    data = generate_unclean_data_vectorized(sum(sizes), seed=seed)
+    chunks, start = [], 0
+    for size in sizes:
+        cleaned = clean.clean_data_vectorized(data.iloc[start:start + size].copy())
+        chunks.append(clean.storage_frame(clean.apply_clean_schema(cleaned)))
+        start += size
+    return chunks
+
+def test_parquet_append_keeps_first_part_schema(tmp_path):
+    backend = ParquetBackend(str(tmp_path))
+    first, second = _cleaned_chunks([20, 30])
+    # An all-null text column in the first part would otherwise be typed null
+    first['CanonicalName'] = pd.Series([None] * len(first), index=first.index, dtype=object)
+    first['Location'] = None
+
+    backend.write_table(first, 'CleanedCustomers', 'replace', dtype=clean.sql_column_types(first))
+    backend.write_table(second, 'CleanedCustomers', 'append', dtype=clean.sql_column_types(second))
+
+    stored = backend.read_table('CleanedCustomers')
+    assert len(stored) == 50
+    assert stored['CanonicalName'].iloc[20:].tolist() == second['CanonicalName'].tolist()
+    assert sum(len(chunk) for chunk in backend.read_table('CleanedCustomers', chunksize=7)) == 50
+
+    schema = backend.read_arrow('CleanedCustomers').schema
+    assert str(schema.field('CanonicalName').type) == 'string'
+    assert str(schema.field('PurchaseDate').type) == 'date32[day]'
+    assert str(schema.field('Age').type) == 'int16'
+    assert str(schema.field('State').type) == 'string'
+
+def test_duckdb_round_trip_with_differing_categories():
+    backend = DuckDBBackend(':memory:')
+    first, second = _cleaned_chunks([5, 60])
+    # Later chunks hold categories the first one lacks, and missing values
+    assert set(second['ProductCategory'].cat.categories) - set(first['ProductCategory'].cat.categories)
+    second.loc[second.index[:3], ['State', 'Age', 'AmountSpent', 'PurchaseDate']] = None
+
+    backend.write_table(first, 'CleanedCustomers', 'replace', dtype=clean.sql_column_types(first))
+    backend.write_table(second, 'CleanedCustomers', 'append', dtype=clean.sql_column_types(second))
+
+    query = "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'CleanedCustomers'"
+    types = dict(backend.connect().execute(query).fetchall())
+    assert types['ProductCategory'] == types['State'] == types['Gender'] == 'VARCHAR'
+    assert types['PurchaseDate'] == 'DATE'
+    assert types['AmountSpent'] == 'DECIMAL(10,2)'
+    assert types['Age'] == 'SMALLINT'
+    assert types['CustomerID'] == 'INTEGER'
+
+    expected = pd.concat([first, second], ignore_index=True)
+    stored = backend.read_table('CleanedCustomers').sort_values('CustomerID', ignore_index=True)
+    assert len(stored) == len(expected)
+    for column in ['ProductCategory', 'State', 'Gender', 'Age', 'AmountSpent', 'PurchaseDate']:
+        assert stored[column].isna().tolist() == expected[column].isna().tolist(), column
+    assert stored['ProductCategory'].dropna().tolist() == expected['ProductCategory'].dropna().astype(str).tolist()
+    assert stored['AmountSpent'].dropna().tolist() == expected['AmountSpent'].dropna().tolist()
+
+def test_duckdb_untyped_append_accepts_new_categories():
+    backend = DuckDBBackend(':memory:')
+    first, second = _cleaned_chunks([5, 60])
+
+    backend.write_table(first, 'Cleaned', 'replace')
+    backend.write_table(second, 'Cleaned', 'append')
+
+    stored = backend.read_table('Cleaned')
+    assert len(stored) == 65
+    assert sorted(stored['ProductCategory'].dropna().unique()) == sorted(
+        pd.concat([first, second])['ProductCategory'].dropna().astype(str).unique())
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from sqlalchemy import MetaData, Numeric, Table, inspect, select
+
+import clean
+from Ingestion import generate_unclean_data_vectorized
+from storage import SQLiteBackend
+
+def test_multi_insert_chunksize_stays_under_sqlserver_parameter_limit():
+    columns = len(clean.CLEAN_SCHEMA)
+    rows = clean.multi_insert_chunksize(columns, None, 'mssql')
+    assert rows * columns < clean.SQLSERVER_MAX_PARAMETERS
+    assert (rows + 2) * columns > clean.SQLSERVER_MAX_PARAMETERS
+    assert clean.multi_insert_chunksize(columns, 10_000, 'mssql') == rows
+    assert clean.multi_insert_chunksize(columns, 50, 'mssql') == 50
+    # Other databases have no such limit, the request passes through
+    assert clean.multi_insert_chunksize(columns, None, 'sqlite') is None
+    assert clean.multi_insert_chunksize(columns, 10_000, 'sqlite') == 10_000
+
+def test_amounts_are_stored_as_exact_cents(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'customers.db'))
+    data = clean.apply_clean_schema(clean.clean_data_vectorized(generate_unclean_data_vectorized(300, seed=12)))
+    assert data['AmountSpent'].dtype == 'float32'
+    assert clean.write_clean_data_to_sql(data, None, None, 'CleanedCustomers', backend=backend)
+
+    engine = backend.create_engine()
+    column = {column['name']: column['type'] for column in inspect(engine).get_columns('CleanedCustomers')}['AmountSpent']
+    assert isinstance(column, Numeric) and (column.precision, column.scale) == (10, 2)
+
+    # float32 holds 414.09 as 414.0899963..., the table must hold the cents
+    expected = {customer_id: round(float(amount), 2)
+                for customer_id, amount in zip(data['CustomerID'], data['AmountSpent']) if amount == amount}
+    table = Table('CleanedCustomers', MetaData(), autoload_with=engine)
+    with engine.connect() as conn:
+        stored = dict(conn.execute(select(table.c.CustomerID, table.c.AmountSpent)
+                                   .where(table.c.AmountSpent.is_not(None))).all())
+    assert stored == {customer_id: Decimal(f"{amount:.2f}") for customer_id, amount in expected.items()}
+
+    frame = backend.read_table('CleanedCustomers').dropna(subset=['AmountSpent'])
+    assert dict(zip(frame['CustomerID'], frame['AmountSpent'])) == expected